@@ -0,0 +1,100 @@
+"""
+Scaling benchmark for pdf_pair_screenshot_comparator_gui.
+Generates folders of 10 to 100 synthetic source/target PDF pairs, runs create_folders_screenshots_and_PDF_file on
+each and reports the number of document renders and the time per file. With one render per document the time per
+file stays flat as the folder grows (linear scaling); the old per-folder re-rendering grew with the folder size.
+docx2pdf is replaced by a stub, so the benchmark runs offline on Linux without Microsoft Word.
+
+Usage: python benchmarks/pair_comparator_scaling.py [--sizes 10 25 50 100] [--pages 3] [--workers 1]
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import file_identity
+import pdf_page_renderer
+import pdf_pair_screenshot_comparator_gui as comparator
+from pdf_render_cache import RenderCache
+
+
+def make_pdf(path, pages, label):
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{label} - page {page_num + 1}", fontsize=18)
+        page.draw_rect(fitz.Rect(72, 120, 520, 400), color=(0, 0, 0.6), width=2)
+    doc.save(path)
+    doc.close()
+
+
+def run_folder(work_folder, file_count, pages):
+    source_folder = os.path.join(work_folder, f"source_{file_count}")
+    target_folder = os.path.join(work_folder, f"target_{file_count}")
+    output_folder = os.path.join(work_folder, f"output_{file_count}")
+    for folder in (source_folder, target_folder, output_folder):
+        os.makedirs(folder)
+    for file_number in range(file_count):
+        make_pdf(os.path.join(source_folder, f"doc_{file_number:03d}.pdf"), pages, f"Source {file_number}")
+        make_pdf(os.path.join(target_folder, f"doc_{file_number:03d}.pdf"), pages, f"Target {file_number}")
+
+    # Start every folder size cold: empty render cache, hash cache and per-run memo
+    comparator.render_cache = RenderCache(os.path.join(work_folder, f"render_cache_{file_count}"))
+    file_identity.file_identity = file_identity.FileIdentityCache(os.path.join(work_folder, f"hashes_{file_count}.json"))
+    comparator.rendered_documents.clear()
+
+    renders = [0]
+    render_pdf_pages = comparator.render_pdf_pages
+
+    def counting_render_pdf_pages(*args, **kwargs):
+        renders[0] += 1
+        return render_pdf_pages(*args, **kwargs)
+
+    comparator.render_pdf_pages = counting_render_pdf_pages
+    current_folder = os.getcwd()
+    os.chdir(output_folder)
+    try:
+        start_time = time.perf_counter()
+        comparator.create_folders_screenshots_and_PDF_file(source_folder, target_folder)
+        elapsed = time.perf_counter() - start_time
+    finally:
+        os.chdir(current_folder)
+        comparator.render_pdf_pages = render_pdf_pages
+
+    return {"files": file_count, "renders": renders[0], "seconds": round(elapsed, 3),
+            "seconds_per_file": round(elapsed / file_count, 4)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Folder-size scaling benchmark for the PDF pair comparator.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100], help="numbers of file pairs per folder")
+    parser.add_argument("--pages", type=int, default=3, help="pages per synthetic PDF")
+    parser.add_argument("--workers", type=int, default=1, help="render processes")
+    args = parser.parse_args(argv)
+
+    pdf_page_renderer.RENDER_WORKERS = args.workers
+    # The Word conversion is not what is measured here, and needs Microsoft Word
+    comparator.convert_word_to_pdf = shutil.copyfile
+
+    work_folder = tempfile.mkdtemp(prefix="pair_comparator_bench_")
+    try:
+        results = [run_folder(work_folder, file_count, args.pages) for file_count in args.sizes]
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    for result in results:
+        print(f"{result['files']:5d} files  {result['renders']:5d} renders  {result['seconds']:8.3f} s  {result['seconds_per_file']:.4f} s/file")
+    # Linear scaling: the time per file of the largest folder stays close to the smallest
+    ratio = results[-1]["seconds_per_file"] / results[0]["seconds_per_file"]
+    print(json.dumps({"results": results, "per_file_time_ratio": round(ratio, 3)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
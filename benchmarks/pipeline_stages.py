@@ -0,0 +1,254 @@
+"""
+Stage-level benchmark for the PDF comparison pipeline.
+Generates synthetic source/target PDFs with PyMuPDF (text-heavy, image-heavy, mixed portrait/landscape and
+mismatched page counts) and times the production entry points on them: hashing (file_hash), rendering through the
+process pool with a cold and then a warm render cache (render_pdf_pages), and whole comparisons with
+create_folders_screenshots_and_PDF_file for the native PDF and the Word backend. The RunReport of every comparison
+is kept, so the result also has its time per pipeline stage (render, encode, align, write_pdf, build_docx, ...).
+Every scenario runs in its own process, so its peak RSS is its own, and every run starts from an empty render cache
+and hash cache. The results are written as JSON with a stable layout; pass an earlier result file with --compare to
+print the speed-up per stage.
+The Word backend uses a stub converter that only copies the Word file, so the benchmark runs offline on Linux.
+
+Usage: python benchmarks/pipeline_stages.py [--scale 1.0] [--quality review] [--workers 2] [--output stages.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import fitz  # PyMuPDF
+import file_identity
+import pdf_comparison_pipeline
+import pdf_word_converters
+from pdf_quality_profiles import QUALITY_PROFILES, DEFAULT_QUALITY_PROFILE, get_quality_profile
+from pdf_page_renderer import render_pdf_pages, shutdown_render_pool
+from pdf_render_cache import RenderCache
+from pdf_run_report import RunReport
+
+# Layout version of the JSON results, bumped when keys change
+RESULT_VERSION = 2
+
+# name: (source pages, target pages, page kind, every how many pages a landscape page is inserted, 0 for none)
+SCENARIOS = {
+    "text_portrait": (60, 60, "text", 0),
+    "mixed_orientation": (60, 60, "text", 3),
+    "image_heavy": (20, 20, "image", 0),
+    "mismatched_counts": (40, 44, "text", 0),
+}
+
+STAGES = ["hashing", "render_cold", "render_cached", "pipeline_pdf", "pipeline_word"]
+
+
+def make_pdf(path, page_count, kind, landscape_every, label, inserted_pages=()):
+    """Write a synthetic PDF; inserted_pages are extra pages placed before the given page numbers."""
+    rng = np.random.default_rng(len(label) * 1000 + page_count)
+    doc = fitz.open()
+    for page_num in range(page_count):
+        if page_num in inserted_pages:
+            extra = doc.new_page()
+            extra.insert_text((72, 72), f"Inserted page before {page_num + 1}", fontsize=18)
+        landscape = landscape_every and page_num % landscape_every == landscape_every - 1
+        page = doc.new_page(width=842 if landscape else 595, height=595 if landscape else 842)
+        page.insert_text((72, 60), f"{label} - page {page_num + 1}", fontsize=16)
+        if kind == "image":
+            # Noise compresses badly, like scanned or photographic pages
+            noise = rng.integers(0, 256, size=(600, 420, 3), dtype=np.uint8)
+            pixmap = fitz.Pixmap(fitz.csRGB, 420, 600, noise.tobytes(), False)
+            page.insert_image(fitz.Rect(72, 90, page.rect.width - 72, page.rect.height - 72), pixmap=pixmap)
+        else:
+            lines = [f"{page_num + 1}.{line} Lorem ipsum dolor sit amet, consectetur adipiscing elit {line * 17 % 97}" for line in range(45)]
+            page.insert_textbox(fitz.Rect(72, 90, page.rect.width - 72, page.rect.height - 72), "\n".join(lines), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+class StubWordConverter:
+    # Stands in for docx2pdf and LibreOffice, the benchmark times the pipeline around the conversion
+    name = "stub"
+
+    def convert(self, word_file_path, pdf_file_path):
+        self.convert_batch([(word_file_path, pdf_file_path)])
+
+    def convert_batch(self, jobs):
+        for word_file_path, pdf_file_path in jobs:
+            shutil.copyfile(word_file_path, pdf_file_path)
+        return []
+
+    def close(self):
+        pass
+
+
+def fresh_caches(work_folder, run_name):
+    """Point the pipeline at an empty render cache and hash cache, so every run starts cold."""
+    cache = RenderCache(os.path.join(work_folder, f"render_cache_{run_name}"))
+    pdf_comparison_pipeline.render_cache = cache
+    file_identity.file_identity = file_identity.FileIdentityCache(os.path.join(work_folder, f"hashes_{run_name}.json"))
+    return cache
+
+
+def run_pipeline(work_folder, run_name, source_path, target_path, output_backend, quality, workers):
+    """Compare source and target with create_folders_screenshots_and_PDF_file. Returns (seconds, stage totals, output bytes)."""
+    fresh_caches(work_folder, run_name)
+    output_folder = os.path.join(work_folder, f"output_{run_name}")
+    os.makedirs(output_folder)
+    report = RunReport()
+    current_folder = os.getcwd()
+    # Comparisons are written below the current folder, see comparison_output_path
+    os.chdir(output_folder)
+    try:
+        start_time = time.perf_counter()
+        pdf_comparison_pipeline.create_folders_screenshots_and_PDF_file([(source_path, [target_path])], workers=workers, output_backend=output_backend,
+                                                                         quality=quality, report=report, word_converter="stub")
+        seconds = time.perf_counter() - start_time
+        output_bytes = os.path.getsize(pdf_comparison_pipeline.comparison_output_path(source_path, target_path))
+    finally:
+        os.chdir(current_folder)
+    return seconds, {stage: round(stage_seconds, 4) for stage, stage_seconds in report.stage_totals().items()}, output_bytes
+
+
+def run_scenario(name, scale, quality, workers):
+    """Run one scenario in this process and return its result dictionary."""
+    source_pages, target_pages, kind, landscape_every = SCENARIOS[name]
+    source_pages = max(1, round(source_pages * scale))
+    target_pages = max(1, round(target_pages * scale))
+    profile = get_quality_profile(quality)
+    pdf_word_converters.WORD_CONVERTERS["stub"] = StubWordConverter
+
+    work_folder = tempfile.mkdtemp(prefix=f"pipeline_stages_{name}_")
+    try:
+        source_path = os.path.join(work_folder, "source.pdf")
+        target_path = os.path.join(work_folder, "target.pdf")
+        make_pdf(source_path, source_pages, kind, landscape_every, "Source")
+        # The extra target pages are spread over the document
+        inserted = set(range(1, source_pages, max(1, source_pages // max(1, target_pages - source_pages)))[:target_pages - source_pages])
+        make_pdf(target_path, source_pages, kind, landscape_every, "Target", inserted)
+        rendered_pages = source_pages + target_pages
+
+        timings = dict.fromkeys(STAGES, 0.0)
+        pipeline_stages = {}
+        output_sizes = {}
+
+        cache = fresh_caches(work_folder, "render")
+        start_time = time.perf_counter()
+        hashes = {path: file_identity.file_hash(path) for path in (source_path, target_path)}
+        timings["hashing"] = time.perf_counter() - start_time
+
+        # The first pass renders every page into the empty cache, the second only finds them there
+        for stage in ("render_cold", "render_cached"):
+            start_time = time.perf_counter()
+            for path, prefix in ((source_path, "source"), (target_path, "target")):
+                render_pdf_pages(path, work_folder, prefix, workers=workers, render_cache=cache, file_hash=hashes[path], quality=profile)
+            timings[stage] = time.perf_counter() - start_time
+
+        for output_backend in ("pdf", "word"):
+            stage = f"pipeline_{output_backend}"
+            timings[stage], pipeline_stages[output_backend], output_sizes[f"{output_backend}_bytes"] = run_pipeline(
+                work_folder, output_backend, source_path, target_path, output_backend, quality, workers)
+    finally:
+        shutdown_render_pool()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    return {
+        "scenario": name,
+        "source_pages": source_pages,
+        "target_pages": target_pages,
+        "rendered_pages": rendered_pages,
+        "stages": {stage: {"seconds": round(seconds, 4), "pages_per_second": round(rendered_pages / seconds, 2) if seconds else None}
+                   for stage, seconds in timings.items()},
+        # Time per stage of the pipeline runs, from their RunReport
+        "pipeline_stages": pipeline_stages,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "output": output_sizes,
+    }
+
+
+def compare(results, baseline):
+    """Print the speed-up of every stage against an earlier result file."""
+    if baseline.get("version") != RESULT_VERSION:
+        print(f"Baseline has result version {baseline.get('version')}, expected {RESULT_VERSION}; only matching stages are compared", file=sys.stderr)
+    baseline_scenarios = {scenario["scenario"]: scenario for scenario in baseline["scenarios"]}
+    for scenario in results["scenarios"]:
+        previous = baseline_scenarios.get(scenario["scenario"])
+        if previous is None:
+            continue
+        print(f"{scenario['scenario']}:", file=sys.stderr)
+        for stage in STAGES:
+            seconds = scenario["stages"][stage]["seconds"]
+            previous_seconds = previous["stages"].get(stage, {}).get("seconds")
+            if seconds and previous_seconds:
+                print(f"  {stage:14s} {previous_seconds:9.3f} s -> {seconds:9.3f} s  x{previous_seconds / seconds:.2f}", file=sys.stderr)
+        print(f"  peak RSS       {previous['peak_rss_mb']:9.1f} MB -> {scenario['peak_rss_mb']:8.1f} MB", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the production entry points of the PDF comparison pipeline on synthetic documents.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the page counts of every scenario")
+    parser.add_argument("--quality", choices=list(QUALITY_PROFILES), default=DEFAULT_QUALITY_PROFILE, help="quality profile to render with")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: one per CPU core)")
+    parser.add_argument("--output", default=None, help="path of the JSON results (default: standard output)")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to compare with")
+    parser.add_argument("--run-scenario", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_scenario:
+        # Child process: run a single scenario and hand the result back in a file, PyMuPDF may print to standard output
+        result = run_scenario(args.run_scenario, args.scale, args.quality, args.workers)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    results = {
+        "version": RESULT_VERSION,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "quality": args.quality,
+        "scale": args.scale,
+        "workers": args.workers,
+        "scenarios": [],
+    }
+    for name in args.scenarios:
+        print(f"Running {name}...", file=sys.stderr)
+        result_file, result_path = tempfile.mkstemp(suffix=".json")
+        os.close(result_file)
+        command = [sys.executable, os.path.abspath(__file__), "--run-scenario", name, "--result-file", result_path,
+                   "--scale", str(args.scale), "--quality", args.quality]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+        try:
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+            with open(result_path, encoding="utf-8") as f:
+                results["scenarios"].append(json.load(f))
+        finally:
+            os.remove(result_path)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Background job runner for the Tk comparison tools.
+Runs a long job (the render/docx/convert pipeline) on a background executor so the window never freezes.
+Progress events from the job are put on a queue and picked up by the Tk main thread, which shows them in a
+progress window with one bar for the mappings, one for the current stage and a per-stage ETA.
+The Cancel button sets an event that the pipeline checks between pages.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import tkinter as tk
+from tkinter import ttk
+
+# How often (in milliseconds) the Tk main thread picks up progress events
+POLL_INTERVAL = 100
+
+
+def format_duration(seconds):
+    minutes = int(seconds // 60)
+    seconds = int(seconds % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class ComparisonJobRunner:
+    def __init__(self, root, job, on_finished, title="Processing"):
+        """job(progress, cancel_event) runs on the background thread; on_finished(error) runs on the Tk thread.
+
+        error is None on success, the JobCancelled exception after a cancel, or whatever else the job raised.
+        """
+        self.root = root
+        self.job = job
+        self.on_finished = on_finished
+        self.title = title
+
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stage_key = None
+        self.stage_start = None
+
+    def start(self):
+        self.create_window()
+        future = self.executor.submit(self.job, self.events.put, self.cancel_event)
+        future.add_done_callback(lambda done: self.events.put({"finished": done.exception()}))
+        self.root.after(POLL_INTERVAL, self.poll_events)
+
+    def create_window(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title(self.title)
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        frame = ttk.Frame(self.window, padding="10")
+        frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.mapping_label = ttk.Label(frame, text="Starting...", width=60)
+        self.mapping_label.grid(row=0, column=0, sticky='w', pady=2)
+        self.mapping_bar = ttk.Progressbar(frame, orient="horizontal", length=400, mode="determinate")
+        self.mapping_bar.grid(row=1, column=0, pady=2)
+
+        self.stage_label = ttk.Label(frame, text="", width=60)
+        self.stage_label.grid(row=2, column=0, sticky='w', pady=2)
+        self.stage_bar = ttk.Progressbar(frame, orient="horizontal", length=400, mode="determinate")
+        self.stage_bar.grid(row=3, column=0, pady=2)
+
+        self.cancel_button = ttk.Button(frame, text="Cancel", command=self.cancel)
+        self.cancel_button.grid(row=4, column=0, pady=5)
+
+        # Keep the mapper window from starting a second run meanwhile
+        self.window.transient(self.root)
+        self.window.grab_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.cancel_button.configure(state="disabled")
+        self.stage_label.configure(text="Cancelling after the current page...")
+
+    def poll_events(self):
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if "finished" in event:
+                    self.finish(event["finished"])
+                    return
+                self.show_event(event)
+        except queue.Empty:
+            pass
+        self.root.after(POLL_INTERVAL, self.poll_events)
+
+    def show_event(self, event):
+        mapping, mappings = event["mapping"], max(event["mappings"], 1)
+        done, total = event["done"], max(event["total"], 1)
+
+        # The ETA of a stage is extrapolated from its own elapsed time
+        stage_key = (mapping, event["stage"])
+        if stage_key != self.stage_key:
+            self.stage_key = stage_key
+            self.stage_start = time.time()
+        elapsed = time.time() - self.stage_start
+        eta = f" - ETA {format_duration(elapsed / done * (total - done))}" if 0 < done < total else ""
+
+        self.mapping_label.configure(text=f"Mapping {min(mapping + 1, mappings)} of {mappings}")
+        self.mapping_bar.configure(maximum=mappings, value=mapping + done / total)
+        if not self.cancel_event.is_set():
+            self.stage_label.configure(text=f"{event['stage']}: {done}/{total}{eta}" if total > 1 else event["stage"])
+        self.stage_bar.configure(maximum=total, value=done)
+
+    def finish(self, error):
+        self.executor.shutdown(wait=False)
+        self.window.grab_release()
+        self.window.destroy()
+        self.on_finished(error)
@@ -0,0 +1,109 @@
+"""
+Shared file identity service for the PDF tools.
+file_hash returns a content hash of a file, but first checks (device, inode, size, mtime) against a persisted
+hash cache: an unchanged file costs one os.stat instead of a full read.
+Only when the stat signature changed is the file re-hashed, with large buffered reads and BLAKE2b,
+which is faster than MD5 on 64-bit machines.
+"""
+
+import os
+import time
+import json
+import atexit
+import uuid
+import hashlib
+import threading
+
+# Location of the persisted hash cache, next to the render cache
+HASH_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".pdf_comparison_cache", "file_hashes.json")
+
+# Files are read in chunks of this many bytes while hashing
+READ_SIZE = 1024 * 1024
+
+# New hashes are written to disk at most this often (in seconds), and once more when the process exits
+SAVE_INTERVAL = 2.0
+
+
+def hash_file(file_path):
+    """Hash the contents of a file with BLAKE2b and return the hex digest."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb", buffering=0) as f:
+        buffer = bytearray(READ_SIZE)
+        view = memoryview(buffer)
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def stat_signature(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+class FileIdentityCache:
+    def __init__(self, cache_path=HASH_CACHE_PATH):
+        self.cache_path = cache_path
+        self.entries = None
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_save = 0.0
+
+    def file_hash(self, file_path):
+        """Return the content hash of a file, re-hashing it only when its stat signature changed."""
+        file_path = os.path.abspath(file_path)
+        signature = stat_signature(file_path)
+        with self.lock:
+            self._load()
+            entry = self.entries.get(file_path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        digest = hash_file(file_path)
+        with self.lock:
+            self.entries[file_path] = [signature, digest]
+            self.dirty = True
+            if time.monotonic() - self.last_save >= SAVE_INTERVAL:
+                self._save()
+        return digest
+
+    def flush(self):
+        """Write hashes that are not on disk yet."""
+        with self.lock:
+            if self.dirty:
+                self._save()
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self):
+        # Another process may save at the same time, the last writer wins and the loser only re-hashes later
+        temp_path = f"{self.cache_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.dirty = False
+        self.last_save = time.monotonic()
+
+
+# Shared by every tool in the process
+file_identity = FileIdentityCache()
+atexit.register(file_identity.flush)
+
+
+def file_hash(file_path):
+    """Return the content hash of a file, see FileIdentityCache.file_hash."""
+    return file_identity.file_hash(file_path)
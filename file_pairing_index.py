@@ -0,0 +1,146 @@
+"""
+Automatic source/target pairing for the file mapper GUIs.
+Builds an index over the source files and proposes source -> targets mappings in bulk.
+Locale suffixes such as _de_DE, -FR or .it are stripped before matching; exact normalized names are matched
+through a dictionary, everything else through an inverted index of filename character trigrams, whose posting lists
+are NumPy arrays: the trigrams every source shares with a target are counted with one np.bincount.
+Near ties are broken with the page count and a first-page text fingerprint of the PDFs involved.
+"""
+
+import os
+import re
+from collections import defaultdict
+import numpy as np
+
+# ISO 639-1 language codes that are stripped from the end of file names, alone or followed by a region (de_DE, pt-BR)
+LANGUAGE_CODES = set("""
+af am ar az be bg bn bs ca cs cy da de el en es et eu fa fi fr ga gl gu he hi hr hu hy id is it ja ka kk km kn ko
+lo lt lv mk ml mn mr ms mt my nb ne nl nn no pa pl pt ro ru si sk sl sq sr sv sw ta te th tl tr uk ur uz vi zh zu
+""".split())
+
+LOCALE_SUFFIX = re.compile(r"[\s_\-.(\[]+([a-z]{2})(?:[_\-]([a-z]{2}|hans|hant|latn|cyrl))?[)\]]?$", re.IGNORECASE)
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy match
+MIN_SIMILARITY = 0.6
+
+# Candidates whose similarity is this close to the best one are tie-broken on the PDF contents
+TIE_MARGIN = 0.05
+
+
+def strip_locale(name):
+    """Remove trailing locale suffixes from a file name without extension, e.g. Manual_v2_de_DE -> Manual_v2."""
+    while True:
+        match = LOCALE_SUFFIX.search(name)
+        if not match or match.group(1).lower() not in LANGUAGE_CODES or match.start() == 0:
+            return name
+        name = name[:match.start()]
+
+
+def normalize_name(file_path):
+    """Return the lowercase file name without extension, locale suffix or punctuation."""
+    name = strip_locale(os.path.splitext(os.path.basename(file_path))[0])
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+def name_trigrams(normalized_name):
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def pdf_identity(file_path):
+    """Return (page_count, first_page_numbers) of a PDF, or None when it cannot be read."""
+    import fitz  # PyMuPDF, only needed for tie-breaking
+
+    try:
+        with fitz.open(file_path) as pdf_file:
+            if pdf_file.page_count == 0:
+                return 0, frozenset()
+            return pdf_file.page_count, frozenset(re.findall(r"\d+", pdf_file[0].get_text("text")))
+    except Exception:
+        return None
+
+
+class FilePairingIndex:
+    def __init__(self, source_files):
+        self.source_files = list(source_files)
+        self.by_name = defaultdict(list)
+        self.by_trigram = defaultdict(list)
+        self.trigram_sets = []
+        self._identities = {}
+
+        for source_index, source_file in enumerate(self.source_files):
+            normalized = normalize_name(source_file)
+            self.by_name[normalized].append(source_index)
+            trigrams = name_trigrams(normalized)
+            self.trigram_sets.append(trigrams)
+            for trigram in trigrams:
+                self.by_trigram[trigram].append(source_index)
+        self.by_trigram = {trigram: np.array(source_indices, dtype=np.intp) for trigram, source_indices in self.by_trigram.items()}
+        self.trigram_counts = np.array([len(trigrams) for trigrams in self.trigram_sets])
+
+    def match(self, target_file):
+        """Return the source file that best matches a target file, or None."""
+        normalized = normalize_name(target_file)
+        candidates = [(1.0, source_index) for source_index in self.by_name.get(normalized, [])]
+
+        if not candidates:
+            candidates = self._fuzzy_candidates(name_trigrams(normalized))
+
+        if not candidates:
+            return None
+        best_similarity = max(similarity for similarity, _ in candidates)
+        tied = [source_index for similarity, source_index in candidates if similarity >= best_similarity - TIE_MARGIN]
+        if len(tied) > 1:
+            return self.source_files[self._break_tie(target_file, tied)]
+        return self.source_files[tied[0]]
+
+    def _fuzzy_candidates(self, trigrams):
+        # Count the trigrams each source shares with the target, all posting lists at once
+        postings = [self.by_trigram[trigram] for trigram in trigrams if trigram in self.by_trigram]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.source_files))
+        similarities = 2 * shared / (len(trigrams) + self.trigram_counts)
+        # Candidates in source order, the first one wins a tie that the PDF contents cannot break
+        source_indices = np.flatnonzero(similarities >= MIN_SIMILARITY)
+        return list(zip(similarities[source_indices].tolist(), source_indices.tolist()))
+
+    def _break_tie(self, target_file, source_indices):
+        target_identity = self._identity(target_file)
+        if target_identity is None:
+            return source_indices[0]
+        target_pages, target_numbers = target_identity
+
+        def tie_score(source_index):
+            source_identity = self._identity(self.source_files[source_index])
+            if source_identity is None:
+                return (False, 0.0)
+            source_pages, source_numbers = source_identity
+            union = source_numbers | target_numbers
+            return (source_pages == target_pages, len(source_numbers & target_numbers) / len(union) if union else 1.0)
+
+        return max(source_indices, key=tie_score)
+
+    def _identity(self, file_path):
+        if file_path not in self._identities:
+            self._identities[file_path] = pdf_identity(file_path)
+        return self._identities[file_path]
+
+
+def propose_mappings(source_files, target_files, mapped_targets=()):
+    """Propose (source_file, [target_files]) mappings, in source order, for every target that matches a source.
+
+    Targets in mapped_targets are left out, so proposals never duplicate existing mappings.
+    """
+    index = FilePairingIndex(source_files)
+    mapped_targets = set(mapped_targets)
+    proposals = defaultdict(list)
+
+    for target_file in target_files:
+        if target_file in mapped_targets:
+            continue
+        source_file = index.match(target_file)
+        if source_file is not None and source_file != target_file:
+            proposals[source_file].append(target_file)
+
+    return [(source_file, proposals[source_file]) for source_file in dict.fromkeys(source_files) if source_file in proposals]
@@ -1,30 +1,40 @@
 """
 Allows interactive mapping of multiple source PDF files to one or more target PDF files using a Tkinter GUI.
-Supports caching via MD5 checksums to skip redundant screenshot generation.
-Converts each page of source and target PDFs to high-resolution images using PyMuPDF (with zoom applied).
-Generates side-by-side page comparisons, alternating between source and target pages.
-Builds a Word document with automatic landscape/portrait layout detection for each page.
-Converts the Word document into PDF output using docx2pdf.
+Auto Map proposes the mappings of the remaining targets by file name (see file_pairing_index).
+Identifies files by a BLAKE2b content hash, cached by path, size and modification time (see file_identity), so
+unchanged documents are neither hashed again nor rendered again: rendered pages come from a persistent render cache,
+and with "Skip Unchanged" mappings whose output is up to date are skipped through the job journal.
+Converts each page of source and target PDFs to images at the resolution and encoding of the chosen quality profile.
+Generates page comparisons, alternating between source and target pages or side by side / stacked on one page.
+Writes the comparison through a Word document with automatic landscape/portrait layout detection for each page,
+converted to PDF by a pluggable converter (docx2pdf through Microsoft Word, or a pool of headless LibreOffice workers,
+see pdf_word_converters), or directly as a PDF of the screenshots or of the original vector pages.
+Runs in the background with progress and cancel, and writes a report of the time spent per stage.
 Outputs results into structured subfolders, one per target, for easy review.
 Includes scrollable mapping display for tracking selected file pairings.
-Final cleanup: deletes temporary PNG and DOCX files, keeping only final PDFs.
+Temporary screenshots and Word documents live in a scratch workspace of the run (see pdf_job_workspace), which is
+removed when the run ends; only the final PDFs are written next to the outputs.
 """
 
 import os
-import fitz  #PyMuPDF
-import PIL
-from PIL import Image
-from docx import Document
-from docx.enum.section import WD_ORIENT
-from docx.shared import Inches
-from docx.shared import Pt
-import docx2pdf
 import time
 from tkinter import font
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import shutil
-import hashlib
+from file_pairing_index import propose_mappings
+from pdf_comparison_pipeline import create_folders_screenshots_and_PDF_file, JobCancelled
+from comparison_job_runner_gui import ComparisonJobRunner
+from pdf_job_journal import JobJournal
+from pdf_quality_profiles import QUALITY_PROFILES, DEFAULT_QUALITY_PROFILE
+from pdf_run_report import RunReport, format_stage_totals, REPORT_FILE_NAME
+from pdf_text_diff import TEXT_SIMILARITY_THRESHOLD
+from pdf_page_selection import PageSelectionError, page_selection
+
+# Output backends offered in the GUI
+OUTPUT_BACKENDS = {"Word + docx2pdf": "word", "Native PDF": "pdf", "Vector PDF": "vector"}
+
+# Page layouts offered in the GUI, see pdf_page_composite
+PAGE_LAYOUTS = {"Alternating": "alternating", "Side by Side": "side_by_side", "Stacked": "stacked"}
 
 class FileMapperApp:
     def __init__(self, root):
@@ -87,7 +97,8 @@ class FileMapperApp:
         ttk.Button(frame, text="Add Target Files", command=self.add_target_files).grid(row=4, column=1, padx=5, pady=5)
         ttk.Button(frame, text="Remove Target Files", command=self.remove_target_files).grid(row=5, column=1, padx=5, pady=5)
 
-        ttk.Button(frame, text="Map Files", command=self.map_files).grid(row=6, column=0, columnspan=2, pady=5)
+        ttk.Button(frame, text="Map Files", command=self.map_files).grid(row=6, column=0, pady=5)
+        ttk.Button(frame, text="Auto Map", command=self.auto_map_files).grid(row=6, column=1, pady=5)
 
         # Mapping display and Scrollbars
         mapping_frame = ttk.Frame(frame)
@@ -106,7 +117,49 @@ class FileMapperApp:
 
         ttk.Button(frame, text="Remove Selected Mapping", command=self.remove_selected_mapping).grid(row=8, column=0, columnspan=2, pady=5)
 
-        ttk.Button(frame, text="OK", command=process_mappings).grid(row=9, column=0, columnspan=2, pady=5)
+
+        # Render and output options
+        options_frame = ttk.Frame(frame)
+        options_frame.grid(row=9, column=0, columnspan=2, pady=5)
+        # Number of processes used to render PDF pages
+        ttk.Label(options_frame, text="Render Workers").grid(row=0, column=0, padx=5)
+        self.render_workers = tk.IntVar(value=os.cpu_count() or 1)
+        ttk.Spinbox(options_frame, from_=1, to=64, width=5, textvariable=self.render_workers).grid(row=0, column=1, padx=5)
+
+        # Word + docx2pdf needs Microsoft Word, Native PDF writes the output directly with PyMuPDF,
+        # Vector PDF embeds the original pages without taking any screenshots
+        ttk.Label(options_frame, text="Output").grid(row=0, column=2, padx=5)
+        self.output_backend = tk.StringVar(value="Word + docx2pdf")
+        ttk.Combobox(options_frame, values=list(OUTPUT_BACKENDS), width=16, state="readonly", textvariable=self.output_backend).grid(row=0, column=3, padx=5)
+
+        # Drop identical page pairs and highlight the changed regions on the target pages
+        self.diff_pages = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Changed Pages Only", variable=self.diff_pages).grid(row=0, column=4, padx=5)
+
+        # Skip mappings whose output is up to date, and resume interrupted runs, using the job journal
+        self.skip_unchanged = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Skip Unchanged", variable=self.skip_unchanged).grid(row=0, column=5, padx=5)
+
+        # Resolution and image encoding of the rendered pages, draft is fastest and print the sharpest
+        ttk.Label(options_frame, text="Quality").grid(row=0, column=6, padx=5)
+        self.quality = tk.StringVar(value=DEFAULT_QUALITY_PROFILE)
+        ttk.Combobox(options_frame, values=list(QUALITY_PROFILES), width=8, state="readonly", textvariable=self.quality).grid(row=0, column=7, padx=5)
+
+        # Compare the page texts first and only take screenshots of pages whose text changed, untranslated pages are listed in the report
+        self.skip_identical_text = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Skip Identical Text", variable=self.skip_identical_text).grid(row=0, column=8, padx=5)
+
+        # Spot check: only compare these pages of every document, e.g. 1-5,12,40- (empty compares every page)
+        ttk.Label(options_frame, text="Pages").grid(row=0, column=9, padx=5)
+        self.pages = tk.StringVar(value="")
+        ttk.Entry(options_frame, width=12, textvariable=self.pages).grid(row=0, column=10, padx=5)
+
+        # Alternating puts source and target on separate pages, Side by Side and Stacked put every page pair on one page
+        ttk.Label(options_frame, text="Layout").grid(row=1, column=2, padx=5, pady=5)
+        self.page_layout = tk.StringVar(value="Alternating")
+        ttk.Combobox(options_frame, values=list(PAGE_LAYOUTS), width=16, state="readonly", textvariable=self.page_layout).grid(row=1, column=3, padx=5, pady=5)
+
+        ttk.Button(frame, text="OK", command=process_mappings).grid(row=10, column=0, columnspan=2, pady=5)
 
     def add_source_files(self):
         files = filedialog.askopenfilenames(title="Select Source Files")
@@ -157,6 +210,19 @@ class FileMapperApp:
         self.mappings.append((source_file, target_files))
         return source_file, target_files
 
+    def auto_map_files(self):
+        # Propose mappings for every target file that is not mapped yet
+        mapped_targets = [target_file for _, target_files in self.mappings for target_file in target_files]
+        proposals = propose_mappings(self.source_files, self.target_files, mapped_targets)
+        if not proposals:
+            messagebox.showinfo("Auto Map", "No matching source and target files were found.")
+            return
+
+        for source_file, target_files in proposals:
+            mapping = f"{source_file} -> {', '.join(target_files)}\n"
+            self.mapping_display.insert(tk.END, mapping)
+            self.mappings.append((source_file, target_files))
+
     def remove_selected_mapping(self):
         try:
             selected_text = self.mapping_display.selection_get()
@@ -176,355 +242,101 @@ class FileMapperApp:
     def get_mappings(self):
         return self.mappings
 
-# Dictionary to store cached results
-cache = {}
+    def get_quality(self):
+        return self.quality.get()
 
-def compute_md5(file_path):
-    """Compute the MD5 hash of a file."""
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+    def get_text_filter(self):
+        return TEXT_SIMILARITY_THRESHOLD if self.skip_identical_text.get() else None
 
+    def get_page_selection(self):
+        pages = self.pages.get().strip()
+        return page_selection(pages) if pages else None
 
-def create_folders_screenshots_and_PDF_file(mappings):     
-            
-    # Iterate over each pair of source and target files
-    for mapping in mappings:
-        source_path, target_paths = mapping
+    def get_skip_unchanged(self):
+        return self.skip_unchanged.get()
 
-        # source_folder is the path to the folder with all source files
-        source_folder = os.path.dirname(source_path)
-        
-        # os.path.basename returns the filename with the extension
-        source_file = os.path.basename(source_path)
-        source_files = os.listdir(source_folder)
-        
-        # os.path.splitext returns the filename without the extension
-        source_name = os.path.splitext(source_file)[0]
-        
-        # source_folder_path is the newly created folder for each of the source files inside the source folder
-        source_folder_path = os.path.join(source_folder, source_name)
-        os.makedirs(source_folder_path, exist_ok=True)
-                
-        # Take screenshots of all pages for source documents
-        page_sizes, source_whole_path, nozoom_folder, nozoom_images_whole_path = take_screenshots_source(source_folder_path, source_path, "source", source_files)
+    def get_diff_pages(self):
+        return self.diff_pages.get()
 
-        
-        for target_path in target_paths:
-            target_folder = os.path.dirname(target_path)
-            target_files = os.listdir(target_folder)
-            target_file = os.path.basename(target_path)
-            
-            # os.path.splitext returns the path and the filename without the extension
-            target_name = os.path.splitext(target_file)[0]
-            # folder_name is the name of each of the target files without the extension
-            folder_name = target_name
-            # folder_path is the path of each of the folders were the output file will be saved, same directory as the script is
-            folder_path = os.path.join(os.getcwd(), folder_name)
-
-            os.makedirs(folder_path, exist_ok=True)
-          
-             
-            # Take screenshots of all pages for target documents
-            page_sizes, target_whole_path = take_screenshots_target(folder_path, target_path, "target", target_files)
-            
-            all_image_path = [img for pair in zip(source_whole_path, target_whole_path) for img in pair]                     
-            
-            doubled_page_sizes = [size for page_size in page_sizes for size in [page_size, page_size]]
-            
-            word_file_path = os.path.join(folder_path, f"{os.path.basename(folder_path)}.docx")
-            
-            # Create Word document with alternating screenshots
-            create_alternating_word_doc(page_sizes, all_image_path, doubled_page_sizes, word_file_path, nozoom_images_whole_path)
-                    
-            # Remove existing PNG files
-            remove_png_files(folder_path, nozoom_folder)    
-            
-            pdf_file_path = os.path.join(folder_name, source_file)
-    
-            # Convert to PDF
-            convert_word_to_pdf(word_file_path, pdf_file_path)
-    
-            # Remove Word file
-            remove_Word_file(folder_path)
-            
-        # Remove existing PNG files
-        remove_source_png_files(source_folder_path)
+    def get_output_backend(self):
+        return OUTPUT_BACKENDS.get(self.output_backend.get(), "word")
 
-def remove_Word_file(folder_path):
-    for root, dirs, files in os.walk(folder_path):   
-        for file in files:
-            if file.endswith(".docx"):
-                os.remove(os.path.join(root, file))
-
-def convert_word_to_pdf(word_file_path, pdf_file_path):
-    docx2pdf.convert(word_file_path, pdf_file_path)
-
-  
-def take_screenshots_source(source_folder_path, source_path, prefix, source_files):  
-
-    # Filter PDF files
-    for x in range(2):
-        pdf_files = [file for file in source_files if file.endswith(".pdf") or file.endswith(".PDF")]
-    
-        if pdf_files:
-            # Process each PDF file found in the directory
-            for pdf_file in pdf_files:
-                
-                # Compute the hash of the PDF file
-                pdf_hash = compute_md5(source_path)
-                
-                # Check if the result is already in the cache
-                if pdf_hash in cache:                    
-                    return cache[pdf_hash]
-                
-                # Otherwise, perform the screenshot operation
-        
-                pdf_file = fitz.open(source_path)
-                source_images = []
-                nozoom_images = []
-                page_sizes = []
-                source_whole_path = []
-                nozoom_images_whole_path = []
-                
-                # Iterate over pages and take screenshots
-                for page_num in range(pdf_file.page_count):
-                    page = pdf_file.load_page(page_num)
-                        
-                    nozoom_image = page.get_pixmap()
-                                   
-                    zoom = 2
-                    mat = fitz.Matrix(zoom, zoom)
-                    source_image = page.get_pixmap(matrix=mat)
-                                   
-                
-                    nozoom_img = Image.frombytes("RGB", [nozoom_image.width, nozoom_image.height], nozoom_image.samples)
-                    source_img = Image.frombytes("RGB", [source_image.width, source_image.height], source_image.samples)
-                    
-                    nozoom_folder = os.path.join(source_folder_path, 'nozoom_folder')
-                    if not os.path.exists(nozoom_folder):
-                        os.makedirs(nozoom_folder)
-                    nozoom_image_path = f"nozoom_page_{page_num + 1:03d}_{prefix}.png"
-                    source_image_path = f"page_{page_num + 1:03d}_{prefix}.png"
-                    nozoom_img_path = f"{nozoom_folder}/{nozoom_image_path}"
-                    source_img_path = f"{source_folder_path}/{source_image_path}"                                    
-                                    
-                    source_img.save(source_img_path, format="PNG")
-                    nozoom_img.save(nozoom_img_path, format="PNG")
-                    
-                    source_whole_path.append(source_img_path)
-                    source_images.append(source_image_path)
-                    nozoom_images_whole_path.append(nozoom_img_path)
-                    nozoom_images.append(nozoom_image_path)
-                    page_sizes.append((page.rect.width, page.rect.height))
-                
-                pdf_file.close()
-                
-                # Store the result in the cache
-                cache[pdf_hash] = (page_sizes, source_whole_path, nozoom_folder, nozoom_images_whole_path)
-                
-            return page_sizes, source_whole_path, nozoom_folder, nozoom_images_whole_path
-    
-def take_screenshots_target(folder_path, target_path, prefix, target_files):  
-
-    # Filter PDF files         
-    for x in range(2):
-        pdf_files = [file for file in target_files if file.endswith(".pdf") or file.endswith(".PDF")]
-
-        if pdf_files:
-            # Process each PDF file found in the directory
-            for pdf_file in pdf_files:
-                
-                # Compute the hash of the PDF file
-                pdf_hash = compute_md5(target_path)
-                
-                # Check if the result is already in the cache
-                if pdf_hash in cache:                    
-                    return cache[pdf_hash]
-                
-                # Otherwise, perform the screenshot operation
-                        
-                pdf_file = fitz.open(target_path)
-                target_images = []
-                page_sizes = []
-                target_whole_path = []
-                
-                # Iterate over pages and take screenshots
-                for page_num in range(pdf_file.page_count):
-                    page = pdf_file.load_page(page_num)                       
-                                                      
-                    zoom = 2
-                    mat = fitz.Matrix(zoom, zoom)
-                    target_image = page.get_pixmap(matrix=mat)
-                                   
-            
-                    target_img = Image.frombytes("RGB", [target_image.width, target_image.height], target_image.samples)
-                    target_image_path = f"page_{page_num + 1:03d}_{prefix}.png"
-                    
-                    target_img_path = f"{folder_path}/{target_image_path}"                
-                    target_img.save(target_img_path, format="PNG")
-                    target_images.append(target_image_path)
-                    
-                    target_whole_path.append(target_img_path)
-                    page_sizes.append((page.rect.width, page.rect.height))
-                    
-                    # Store the result in the cache
-                    cache[pdf_hash] = (page_sizes, target_whole_path)
-                
-                pdf_file.close()
-            
-        return page_sizes, target_whole_path
-        
-def create_alternating_word_doc(page_sizes, all_image_path, doubled_page_sizes, word_file_path, nozoom_images_whole_path):
-
-    # Determine the layout for the first image in the images list
-    first_page_landscape = check_first_image_layout(page_sizes)
-    
-    # first_image = check_first_image_layout(page_sizes) 
-    
-    if first_page_landscape == False:
-        create_word_document_first_portrait(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path, page_sizes, nozoom_images_whole_path)
-        return first_page_landscape
-    else:
-        create_word_document_first_landscape(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path)
-        return first_page_landscape
-    
-def check_first_image_layout(page_sizes):
-     if page_sizes:
-         first_image = page_sizes[0]
-         width, height = first_image
-         return width > height  # True if landscape, False if portrait
-     else:
-         return None  # Return None for an empty image list 
-     return first_image
-
-def create_word_document_first_portrait(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path, page_sizes, nozoom_images_whole_path):
-    doc = Document()
-    sections = doc.sections
-    landscape_page = first_page_landscape
-    # first_image = page_sizes[0]
-    first_image = PIL.Image.open(nozoom_images_whole_path[0])
-    first_image_width, first_image_height = first_image.size
-    
-    # Set margins to zero (remove margins)
-    for section in sections:
-        section.left_margin = section.right_margin = section.top_margin = section.bottom_margin = Inches(0)
-
-    section.page_width = Pt(first_image_width)
-    section.page_height = Pt(first_image_height)
-
-    for image, page_size in zip(all_image_path, doubled_page_sizes):
-        width, height = page_size
-            
-        if width > height:  # Check if width > height (indicating landscape layout)
-            if landscape_page == False:
-                section = doc.add_section(WD_ORIENT.LANDSCAPE)
-            section.page_width = Pt(width)
-            section.page_height = Pt(height)
-            landscape_page = True    
-        else:
-            if landscape_page == True:
-                section = doc.add_section(WD_ORIENT.PORTRAIT)
-                section.page_width = Pt(width)
-                section.page_height = Pt(height)
-            landscape_page = False
-
-           
-        doc.add_picture(image, width=Pt(width)) # Set picture width based on image width
-
-    doc.save(word_file_path)    
-            
-        
-def create_word_document_first_landscape(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path):
-    doc = Document()
-    sections = doc.sections
-    section = doc.sections[-1]
-    landscape_page = first_page_landscape
-    image_number = 1
-    
-
-    for image, page_size in zip(all_image_path, doubled_page_sizes):
-        width, height = page_size  
-
-        if image_number == 1:
-            section.page_width = Pt(width)
-            section.page_height = Pt(height)
-       
-        if width > height:  # Check if width > height (indicating landscape layout)
-            if landscape_page == False:
-                section = doc.add_section(WD_ORIENT.LANDSCAPE)
-                section.page_width = Pt(width)
-                section.page_height = Pt(height)
-            landscape_page = True    
-        else:
-            if landscape_page == True:
-                section = doc.add_section(WD_ORIENT.PORTRAIT)
-            section.page_width = Pt(width)
-            section.page_height = Pt(height)
-            landscape_page = False
-        
-        doc.add_picture(image, width=Pt(width)) # Set picture width based on image width
-
-        image_number += 1
-
-    # Set margins to zero (remove margins)
-    for section in sections:
-        section.left_margin = section.right_margin = section.top_margin = section.bottom_margin = Inches(0) 
-        
-    doc.save(word_file_path)
-    
-
-def remove_png_files(folder_path, nozoom_folder):
-    for root, dirs, files in os.walk(folder_path, topdown=False):      
-        for subdir in dirs:
-                    subdir_path = nozoom_folder
-                    if not os.listdir(subdir_path):
-                        os.rmdir(subdir_path)
-        for file in files:
-            if file.endswith(".png"):
-                os.remove(os.path.join(root, file))
+    def get_page_layout(self):
+        return PAGE_LAYOUTS.get(self.page_layout.get(), "alternating")
 
+    def get_render_workers(self):
+        try:
+            return max(1, self.render_workers.get())
+        except tk.TclError:
+            return None
 
-def remove_source_png_files(source_folder_path):              
-    # Check if the directory exists and remove it
-    if os.path.isdir(source_folder_path):
-        shutil.rmtree(source_folder_path)  # Removes the directory and all its contents
-    
-        
 # Function to show "Finished" message with elapsed time
-def show_finished_message(start_time):
+def show_finished_message(start_time, report=None):
     elapsed_time = time.time() - start_time
     minutes = int(elapsed_time // 60)
     seconds = int(elapsed_time % 60)
-    messagebox.showinfo("Script Finished", f"All files have been processed.\nScript run time: {minutes:02d}:{seconds:02d}")
+    message = f"All files have been processed.\nScript run time: {minutes:02d}:{seconds:02d}"
+    if report is not None and report.stage_totals():
+        # Where the time went, the full breakdown per mapping and page is in the report file
+        message += f"\n\nSlowest stages:\n{format_stage_totals(report)}\n\nDetails: {REPORT_FILE_NAME}"
+    identical_pages = report.to_dict()["counters"].get("identical_text_pages", 0) if report is not None else 0
+    if identical_pages:
+        message += f"\n\n{identical_pages} target pages have the same text as their source page, see {REPORT_FILE_NAME}"
+    messagebox.showinfo("Script Finished", message)
 
 def process_mappings():
        
     start_time = time.time()  # Start the stopwatch
     mappings = app.get_mappings()
-
-    create_folders_screenshots_and_PDF_file(mappings)
+    workers, output_backend, diff_pages = app.get_render_workers(), app.get_output_backend(), app.get_diff_pages()
+    journal = JobJournal() if app.get_skip_unchanged() else None
+    quality = app.get_quality()
+    text_filter = app.get_text_filter()
+    layout = app.get_page_layout()
+    try:
+        selection = app.get_page_selection()
+    except PageSelectionError as e:
+        messagebox.showerror("Error", str(e))
+        return
+    report = RunReport()
+
+    # The pipeline runs on a background thread, the window keeps responding and shows the progress
+    def job(progress, cancel_event):
+        create_folders_screenshots_and_PDF_file(mappings, workers, output_backend, diff_pages, progress, cancel_event, journal, quality, report,
+                                                text_filter=text_filter, page_selection=selection, layout=layout)
+
+    def finished(error):
+        # The report is also written for failed and cancelled runs, they are the ones worth looking into
+        report.save(REPORT_FILE_NAME)
+        if isinstance(error, JobCancelled):
+            messagebox.showinfo("Cancelled", "Processing was cancelled.")
+            return
+        if error is not None:
+            messagebox.showerror("Error", f"Processing failed:\n{error}")
+            return
    
-    show_finished_message(start_time)  # Show "Finished" message with elapsed time   
+        show_finished_message(start_time, report)  # Show "Finished" message with elapsed time   
+
+        root.destroy()
 
-    root.destroy()
+    ComparisonJobRunner(root, job, finished).start()
 
 
-# Create tkinter window
-root = tk.Tk()
-app = FileMapperApp(root)
+# The render pool starts worker processes that re-import this module, so the GUI only starts when run directly
+if __name__ == "__main__":
+    # Create tkinter window
+    root = tk.Tk()
+    app = FileMapperApp(root)
 
-root.withdraw() 
-root.title("Document Screenshot Tool")
-width = 478
-height = 72
-screenwidth = root.winfo_screenwidth()
-screenheight = root.winfo_screenheight()
-root.geometry()
+    root.withdraw() 
+    root.title("Document Screenshot Tool")
+    width = 478
+    height = 72
+    screenwidth = root.winfo_screenwidth()
+    screenheight = root.winfo_screenheight()
+    root.geometry()
 
-root.eval('tk::PlaceWindow . center')
-font_normal = font.Font(family = 'Arial', size = 10)
+    root.eval('tk::PlaceWindow . center')
+    font_normal = font.Font(family = 'Arial', size = 10)
 
-root.mainloop()
+    root.mainloop()
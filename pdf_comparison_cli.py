@@ -0,0 +1,308 @@
+"""
+Headless command-line entry point for the PDF comparison pipeline, for render servers and scheduled runs.
+Reads source -> target mappings from a CSV or JSON manifest, runs every pair through the same pipeline as the
+mapper GUIs (without importing tkinter), writes a JSON result summary and exits with a non-zero code on failures.
+
+CSV manifests have a "source" and a "target" column, one row per pair.
+JSON manifests are either a list of {"source": ..., "targets": [...]} objects or a {source: [targets]} object.
+Relative paths in a manifest are resolved against the folder of the manifest.
+
+With --enqueue, the pairs are not compared here but added as a batch to a SQLite work queue, from which any number
+of worker processes and machines compare them (see pdf_work_queue).
+
+With --plan, the documents are only prescanned (page counts and sizes, nothing is rendered) and the job plan is
+written instead: page count and orientation mismatches, the estimated render cost and unreadable documents.
+
+For quick spot checks, --pages, --every and --sample limit every comparison to some of its pages, e.g.
+--pages 1-5,40- or --sample 20 --seed 7; --text-filter then keeps only the selected pages whose text changed.
+
+Usage: python pdf_comparison_cli.py manifest.csv --output-folder out --summary summary.json
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import traceback
+from pdf_comparison_pipeline import create_folders_screenshots_and_PDF_file, comparison_output_path, comparison_settings, comparison_input_hashes, JobCancelled
+from pdf_job_journal import JobJournal, JOURNAL_FILE_NAME
+from pdf_quality_profiles import QUALITY_PROFILES, DEFAULT_QUALITY_PROFILE
+from pdf_run_report import RunReport, sampling_profiler
+from pdf_word_converters import WORD_CONVERTERS, DEFAULT_WORD_CONVERTER, WordConversionError
+from pdf_job_prescan import prescan_job, job_plan_summary
+from pdf_text_diff import TEXT_SIMILARITY_THRESHOLD
+from pdf_page_selection import PageSelectionError, page_selection, selection_settings
+from pdf_page_composite import LAYOUTS, DEFAULT_LAYOUT
+from pdf_work_queue import WorkQueue
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_BAD_MANIFEST = 2
+
+
+def read_manifest(manifest_path):
+    """Return the mappings of a CSV or JSON manifest as a list of (source_path, [target_paths])."""
+    manifest_folder = os.path.dirname(os.path.abspath(manifest_path))
+
+    if manifest_path.lower().endswith(".json"):
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            pairs = [(source, target) for source, targets in data.items() for target in _as_list(targets)]
+        else:
+            pairs = [(entry["source"], target) for entry in data for target in _as_list(entry.get("targets", entry.get("target")))]
+    else:
+        with open(manifest_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or "source" not in reader.fieldnames or "target" not in reader.fieldnames:
+                raise ValueError("The CSV manifest needs a 'source' and a 'target' column.")
+            pairs = [(row["source"], row["target"]) for row in reader if row["source"] and row["target"]]
+
+    # Group the targets per source, keeping the manifest order
+    mappings = {}
+    for source, target in pairs:
+        source = os.path.join(manifest_folder, source)
+        target = os.path.join(manifest_folder, target)
+        mappings.setdefault(source, []).append(target)
+    return list(mappings.items())
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def run_manifest(mappings, output_backend="pdf", workers=None, diff_pages=False, journal=None, quality=None, report=None,
+                 word_converter=None, scratch_folder=None, tmpfs=False, text_filter=None, selection=None, layout=DEFAULT_LAYOUT, cancel_event=None):
+    """Run every source/target pair and return one result dictionary per pair.
+
+    All targets of a source go through the pipeline in one call, so the source is rendered once for all of them and
+    their Word documents are converted in one batch. A Word document that cannot be converted only fails its own pair;
+    when the call fails otherwise, its pairs are run again one at a time, so one bad pair does not fail the others.
+    The seconds of a pair are its share of the call that compared it.
+    With a JobJournal, pairs whose output is up to date are reported as skipped without running them.
+    With a RunReport, the stages of every pair are timed in it.
+    Once cancel_event is set, the running pairs stop with JobCancelled and are reported as failed.
+    """
+    settings = comparison_settings(output_backend, diff_pages, quality, text_filter, selection,
+                                   DEFAULT_LAYOUT if output_backend == "vector" else layout)
+    pipeline_options = dict(workers=workers, output_backend=output_backend, diff_pages=diff_pages, cancel_event=cancel_event, journal=journal,
+                            quality=quality, report=report, word_converter=word_converter, scratch_folder=scratch_folder, tmpfs=tmpfs,
+                            text_filter=text_filter, page_selection=selection, layout=layout)
+    # Documents without any changed or selected page produce no output when pages are filtered
+    pages_filtered = diff_pages or text_filter is not None or selection is not None
+    results = []
+    for source_path, target_paths in mappings:
+        # Results of the targets of this source that are compared
+        pending = []
+        for target_path in target_paths:
+            output_path = comparison_output_path(source_path, target_path)
+            result = {"source": source_path, "target": target_path, "output": output_path}
+            results.append(result)
+            start_time = time.time()
+            try:
+                for path in (source_path, target_path):
+                    if not os.path.isfile(path):
+                        raise FileNotFoundError(f"No such file: {path}")
+                if journal is not None and journal.is_current(output_path, comparison_input_hashes(source_path, target_path), settings):
+                    result["status"] = "skipped"
+                    result["seconds"] = round(time.time() - start_time, 3)
+                    _print_result(result)
+                    continue
+            except Exception as e:
+                _pair_failed([result], e, start_time)
+                continue
+            pending.append(result)
+
+        if not pending:
+            continue
+        start_time = time.time()
+        try:
+            create_folders_screenshots_and_PDF_file([(source_path, [result["target"] for result in pending])], **pipeline_options)
+            _pairs_done(pending, start_time, pages_filtered)
+            continue
+        except WordConversionError as e:
+            if not e.failures:
+                # The converter could not be used at all, comparing the pairs again would fail the same way
+                _pair_failed(pending, e, start_time)
+                continue
+            # The other pairs of the call were converted, published and recorded
+            errors = {target_path: error for _, target_path, error in e.failures}
+            _pairs_done([result for result in pending if result["target"] not in errors], start_time, pages_filtered, len(pending))
+            for result in pending:
+                if result["target"] in errors:
+                    _pair_failed([result], WordConversionError(errors[result["target"]]), start_time, len(pending))
+            continue
+        except Exception as e:
+            if len(pending) == 1 or isinstance(e, JobCancelled):
+                _pair_failed(pending, e, start_time)
+                continue
+            traceback.print_exc()
+        print(f"Comparing the targets of {os.path.basename(source_path)} together failed, comparing them one at a time.", file=sys.stderr)
+        for result in pending:
+            start_time = time.time()
+            try:
+                create_folders_screenshots_and_PDF_file([(source_path, [result["target"]])], **pipeline_options)
+                _pairs_done([result], start_time, pages_filtered)
+            except Exception as e:
+                _pair_failed([result], e, start_time)
+    return results
+
+
+def _pairs_done(results, start_time, pages_filtered, pair_count=None):
+    """pair_count is the number of pairs the call compared, default len(results)."""
+    for result in results:
+        result["status"] = "ok" if os.path.isfile(result["output"]) or pages_filtered else "failed"
+        if result["status"] == "failed":
+            result["error"] = "No output file was written."
+        result["seconds"] = round((time.time() - start_time) / (pair_count or len(results)), 3)
+        _print_result(result)
+
+
+def _pair_failed(results, error, start_time, pair_count=None):
+    traceback.print_exc()
+    for result in results:
+        result["status"] = "failed"
+        result["error"] = f"{type(error).__name__}: {error}"
+        result["seconds"] = round((time.time() - start_time) / (pair_count or len(results)), 3)
+        _print_result(result)
+
+
+def _print_result(result):
+    seconds = f" ({result['seconds']} s)" if result["status"] != "skipped" else ""
+    print(f"[{result['status']}] {os.path.basename(result['source'])} -> {os.path.basename(result['target'])}{seconds}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the PDF comparison pipeline for every mapping of a manifest.")
+    parser.add_argument("manifest", help="CSV or JSON manifest with the source -> target mappings")
+    parser.add_argument("--output-folder", default=os.getcwd(), help="folder the comparison PDFs are written to (default: current folder)")
+    parser.add_argument("--output-backend", choices=["pdf", "vector", "word"], default="pdf",
+                        help="pdf writes the screenshots with PyMuPDF, vector embeds the original pages, word converts a Word document (default: pdf)")
+    parser.add_argument("--layout", choices=list(LAYOUTS), default=DEFAULT_LAYOUT,
+                        help="alternating writes source and target on separate pages, side_by_side and stacked put every page pair "
+                             f"on one page (default: {DEFAULT_LAYOUT}, the vector backend always alternates)")
+    parser.add_argument("--word-converter", choices=list(WORD_CONVERTERS), default=DEFAULT_WORD_CONVERTER,
+                        help=f"Word to PDF converter of the word backend, docx2pdf needs Microsoft Word (default: {DEFAULT_WORD_CONVERTER})")
+    parser.add_argument("--workers", type=int, default=None, help="number of render processes (default: all cores)")
+    parser.add_argument("--diff-pages", action="store_true", help="only keep the page pairs that differ, with the changes highlighted")
+    parser.add_argument("--text-filter", type=float, nargs="?", const=TEXT_SIMILARITY_THRESHOLD, default=None, metavar="SIMILARITY",
+                        help=f"compare the page texts first and only render page pairs whose text is less similar than this, "
+                             f"0 to 1 (default when given: {TEXT_SIMILARITY_THRESHOLD:g}, only identical text is skipped)")
+    parser.add_argument("--pages", default=None, metavar="RANGES",
+                        help="only compare these pages (numbered like in the target documents), e.g. 1-5,12,40-")
+    parser.add_argument("--every", type=int, default=None, metavar="N", help="only compare every Nth page (1, N+1, 2N+1, ...)")
+    parser.add_argument("--sample", type=int, default=None, metavar="K", help="only compare a random sample of K pages of every document")
+    parser.add_argument("--seed", type=int, default=None, help="seed of --sample, the same seed picks the same pages (default: 0)")
+    parser.add_argument("--quality", choices=list(QUALITY_PROFILES), default=DEFAULT_QUALITY_PROFILE,
+                        help=f"resolution and image encoding profile (default: {DEFAULT_QUALITY_PROFILE})")
+    parser.add_argument("--summary", default=None, help="path of the JSON result summary (default: standard output)")
+    parser.add_argument("--report", default=None, help="path of a JSON report with the time spent per stage, mapping and page")
+    parser.add_argument("--profile", default=None,
+                        help="profile the run with pyinstrument (when installed) and write the result here, as HTML for .html paths, else as text")
+    parser.add_argument("--journal", default=JOURNAL_FILE_NAME,
+                        help=f"job journal used to skip unchanged pairs and resume interrupted runs, relative to the output folder (default: {JOURNAL_FILE_NAME})")
+    parser.add_argument("--no-journal", action="store_true", help="process every pair, even when its output is up to date")
+    parser.add_argument("--scratch", default=None,
+                        help="folder for the temporary files and rendered pages of the run, every run gets its own workspace in it "
+                             "(default: the system temp folder, with the rendered pages in the shared render cache)")
+    parser.add_argument("--tmpfs", action="store_true", help="keep the temporary files and rendered pages on tmpfs (/dev/shm) when there is one")
+    parser.add_argument("--enqueue", default=None, metavar="QUEUE",
+                        help="add the pairs as a batch to this SQLite work queue instead of comparing them, workers run them (see pdf_work_queue.py)")
+    parser.add_argument("--plan", action="store_true",
+                        help="only prescan the documents and write the job plan (page counts, mismatches, render cost), nothing is rendered")
+    args = parser.parse_args(argv)
+
+    try:
+        selection = page_selection(args.pages, args.every, args.sample, args.seed)
+    except PageSelectionError as e:
+        parser.error(str(e))
+
+    try:
+        mappings = read_manifest(args.manifest)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error: cannot read manifest {args.manifest}: {e}", file=sys.stderr)
+        return EXIT_BAD_MANIFEST
+
+    if args.plan:
+        plan = job_plan_summary(prescan_job(mappings, args.quality))
+        if args.summary:
+            with open(args.summary, "w", encoding="utf-8") as f:
+                json.dump(plan, f, indent=2)
+        else:
+            json.dump(plan, sys.stdout, indent=2)
+            print()
+        return EXIT_FAILURES if plan["problems"] else EXIT_OK
+
+    manifest_path = os.path.abspath(args.manifest)
+    if args.enqueue:
+        # The workers write the outputs, the report of the batch and the journal into the output folder
+        settings = {"output_backend": args.output_backend, "word_converter": args.word_converter, "workers": args.workers,
+                    "diff_pages": args.diff_pages, "text_filter": args.text_filter, "page_selection": selection_settings(selection),
+                    "layout": args.layout, "quality": args.quality, "journal": None if args.no_journal else args.journal,
+                    "scratch_folder": os.path.abspath(args.scratch) if args.scratch else None, "tmpfs": args.tmpfs}
+        work_queue = WorkQueue(args.enqueue)
+        batch_id = work_queue.enqueue(mappings, settings, args.output_folder, manifest_path)
+        work_queue.close()
+        print(json.dumps({"batch": batch_id, "queue": os.path.abspath(args.enqueue),
+                          "jobs": sum(len(target_paths) for _, target_paths in mappings)}, indent=2))
+        return EXIT_OK
+
+    summary_path = os.path.abspath(args.summary) if args.summary else None
+    report_path = os.path.abspath(args.report) if args.report else None
+    profile_path = os.path.abspath(args.profile) if args.profile else None
+    scratch_folder = os.path.abspath(args.scratch) if args.scratch else None
+    os.makedirs(args.output_folder, exist_ok=True)
+    os.chdir(args.output_folder)
+
+    journal = None if args.no_journal else JobJournal(args.journal)
+
+    report = RunReport() if report_path else None
+    profiler = sampling_profiler() if profile_path else None
+    if profile_path and profiler is None:
+        print("Warning: pyinstrument is not installed, the run is not profiled.", file=sys.stderr)
+
+    start_time = time.time()
+    results = run_manifest(mappings, args.output_backend, args.workers, args.diff_pages, journal, args.quality, report, args.word_converter,
+                           scratch_folder, args.tmpfs, args.text_filter, selection, args.layout)
+    failed = sum(1 for result in results if result["status"] == "failed")
+    skipped = sum(1 for result in results if result["status"] == "skipped")
+    summary = {
+        "manifest": manifest_path,
+        "output_backend": args.output_backend,
+        "quality": args.quality,
+        "layout": args.layout,
+        "text_filter": args.text_filter,
+        "page_selection": selection_settings(selection),
+        "word_converter": args.word_converter if args.output_backend == "word" else None,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start_time)),
+        "elapsed_seconds": round(time.time() - start_time, 3),
+        "succeeded": len(results) - failed - skipped,
+        "skipped": skipped,
+        "failed": failed,
+        "results": results,
+    }
+
+    if report is not None:
+        report.save(report_path)
+    if profiler is not None:
+        profiler.stop()
+        with open(profile_path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html() if profile_path.lower().endswith(".html") else profiler.output_text())
+
+    if summary_path:
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+
+    return EXIT_FAILURES if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,605 @@
+"""
+Headless PDF comparison pipeline shared by the mapper GUIs and the command-line tool.
+Renders the pages of each mapped source and target PDF, pairs them (aligning by content when the page counts
+differ), optionally keeps only the changed pages, and writes the alternating comparison either through a Word
+document converted to PDF (see pdf_word_converters), directly as a PDF, or as a vector PDF of the original pages.
+The Word documents of all targets of a source are converted together in one batch, so a pooled converter runs them
+in parallel.
+Very large documents written directly as a PDF are streamed: pages are rendered, compared and written one pair at a
+time, so memory and disk use stay flat however many pages there are.
+Before anything is rendered, every mapped document is prescanned (page counts and sizes only, see pdf_job_prescan),
+so bad mappings fail at once, before the first page is rendered.
+With a text filter, the text layers of each page pair are compared first (see pdf_text_diff) and only the pairs whose
+text differs enough are rendered; pages with identical text are flagged in the run report.
+A page selection (page ranges, every Nth page or a seeded random sample, see pdf_page_selection) limits the rendering
+and the output to the selected page pairs for quick spot checks. Every output page is labelled with its original page
+number.
+A composite layout (see pdf_page_composite) writes every page pair on one output page, side by side or stacked,
+instead of alternating source and target pages.
+Rendered pages are shared by every pair of the run through a reference-counted store (see pdf_render_artifacts),
+so each document is rendered once per run and its pages stay available until the last pair using them is written.
+Intermediate files live in a scratch workspace of the run (see pdf_job_workspace), so runs can go on in parallel.
+Nothing in here imports tkinter, so the pipeline runs on machines without a display.
+"""
+
+import os
+import hashlib
+from docx import Document
+from docx.enum.section import WD_ORIENT
+from docx.shared import Inches
+from docx.shared import Pt
+import fitz  # PyMuPDF
+from file_identity import file_hash
+# JobCancelled is imported from here by the mapper GUIs
+from pdf_page_renderer import iter_rendered_pages, JobCancelled, check_cancelled
+from pdf_render_cache import RenderCache
+from pdf_comparison_writer import create_alternating_pdf, create_alternating_vector_pdf, write_alternating_pdf_stream, label_comparison_pages
+from pdf_page_diff import filter_changed_pages, diff_page_arrays, highlight_boxes, pixmap_to_array, MIN_CHANGE_SCORE
+from pdf_page_alignment import align_pdf_pages, aligned_image_pairs
+from pdf_quality_profiles import get_quality_profile, profile_zoom, encode_pixmap
+from pdf_run_report import timed
+from pdf_word_converters import get_word_converter, WordConversionError
+from pdf_job_prescan import prescan_job, check_job_plan
+from pdf_job_workspace import JobWorkspace, publish_file
+from pdf_text_diff import compare_page_texts, pairs_to_render, identical_text_pages
+from pdf_render_artifacts import RenderArtifactStore
+from pdf_page_selection import select_pairs, selection_settings
+from pdf_page_composite import composite_image_pairs, create_composite_pdf, composite_pixmap, DEFAULT_LAYOUT
+
+# Rendered pages are kept on disk across runs and mappings, keyed by file hash, page and zoom
+render_cache = RenderCache()
+
+# Mappings with a document of at least this many pages are streamed when the output is written directly as a PDF
+STREAM_MIN_PAGES = 300
+
+def comparison_output_path(source_path, target_path):
+    """Return where the comparison of a source and a target is written: <cwd>/<target name>_<pair id>/<source file name>.
+
+    The pair id is a short hash of both full paths, so targets or sources with the same file name in different folders
+    never write to the same output, also when their pairs run in different processes or on different machines.
+    """
+    pair_key = "\n".join(os.path.normcase(os.path.abspath(path)) for path in (source_path, target_path))
+    pair_id = hashlib.blake2b(pair_key.encode("utf-8"), digest_size=4).hexdigest()
+    return os.path.join(os.getcwd(), f"{os.path.splitext(os.path.basename(target_path))[0]}_{pair_id}", os.path.basename(source_path))
+
+
+def comparison_settings(output_backend, diff_pages, quality=None, text_filter=None, page_selection=None, layout=DEFAULT_LAYOUT):
+    """Return the settings that, next to the input files, determine a comparison output."""
+    profile = get_quality_profile(quality)
+    return {"output_backend": output_backend, "diff_pages": diff_pages, "zoom": profile_zoom(profile), "quality": profile.name,
+            "text_filter": text_filter, "page_selection": selection_settings(page_selection), "layout": layout}
+
+
+def comparison_input_hashes(source_path, target_path):
+    return {"source": file_hash(source_path), "target": file_hash(target_path)}
+
+
+def record_completed_output(journal, source_path, target_path, input_hashes, settings, output_written=True):
+    if journal is not None:
+        journal.record(comparison_output_path(source_path, target_path), input_hashes[target_path], settings, output_written)
+
+
+def report_progress(progress, stage, mapping_index, mapping_count, done=0, total=1):
+    """Send a progress event (a dict) to the progress callback, if there is one."""
+    if progress is not None:
+        progress({"stage": stage, "mapping": mapping_index, "mappings": mapping_count, "done": done, "total": total})
+
+
+def create_folders_screenshots_and_PDF_file(mappings, workers=None, output_backend="word", diff_pages=False, progress=None, cancel_event=None, journal=None, quality=None, report=None, word_converter=None,
+                                            scratch_folder=None, tmpfs=False, text_filter=None, page_selection=None, layout=DEFAULT_LAYOUT):     
+    """Run the comparison for every (source_path, [target_paths]) mapping.
+
+    quality is the name of a quality profile (draft, screen, review or print, see pdf_quality_profiles), default review.
+    progress receives an event for every stage and rendered page, see report_progress.
+    Once cancel_event is set the run stops between pages with JobCancelled, after removing its temporary files.
+    With a JobJournal, targets whose output is up to date with the same inputs and settings are skipped,
+    and every completed output is recorded right away so an interrupted run resumes where it stopped.
+    With a RunReport, every stage is timed per mapping (rendering and encoding also per page), see pdf_run_report.
+    word_converter is the name of the Word to PDF converter of the word backend (docx2pdf or libreoffice), default
+    DEFAULT_WORD_CONVERTER of pdf_word_converters.
+    Raises PrescanError before anything is rendered when a mapped document is missing, unreadable or empty.
+    A Word document that cannot be converted does not stop the run: the other pairs are published and recorded, and
+    a WordConversionError with the (source_path, target_path, error) of every failed pair is raised at the end.
+    Temporary files go into a workspace of this run only, under scratch_folder (default: see pdf_job_workspace),
+    on tmpfs when asked, and the finished PDFs are moved into place atomically. With a scratch_folder or tmpfs the
+    rendered pages are kept in the workspace as well, instead of the shared render cache, and go with it.
+    text_filter is a text similarity threshold (0 to 1, see pdf_text_diff): page pairs whose text is at least this
+    similar are not rendered at all, 1.0 only leaves out pages with identical text. None renders every page.
+    page_selection is a PageSelection (see pdf_page_selection): only the selected page pairs are rendered and written.
+    layout is alternating (source and target on separate pages), side_by_side or stacked (one composite page per pair),
+    see pdf_page_composite; the vector backend always alternates.
+    """
+    profile = get_quality_profile(quality)
+    with JobWorkspace(scratch_folder, tmpfs) as workspace:
+        # A scratch folder or tmpfs was asked for, so the rendered pages stay there too instead of in the home folder
+        cache = RenderCache(workspace.folder("render_cache")) if scratch_folder or tmpfs else render_cache
+        with RenderArtifactStore(cache, profile) as artifacts:
+            _compare_mappings(mappings, workspace, artifacts, workers, output_backend, diff_pages, progress, cancel_event, journal, profile,
+                              report=report, word_converter=word_converter, text_filter=text_filter, page_selection=page_selection, layout=layout)
+
+
+def _compare_mappings(mappings, workspace, artifacts, workers, output_backend, diff_pages, progress, cancel_event, journal, profile, report, word_converter,
+                      text_filter, page_selection, layout):
+    mapping_count = len(mappings)
+    if output_backend == "vector":
+        layout = DEFAULT_LAYOUT
+    composite = layout != DEFAULT_LAYOUT
+    settings = comparison_settings(output_backend, diff_pages, profile, text_filter, page_selection, layout)
+    # (source_path, target_path, error) of every pair whose Word document could not be converted
+    conversion_failures = []
+    
+    # Read the page counts and sizes of every document first, a bad mapping fails before anything is rendered
+    report_progress(progress, "Checking documents", 0, mapping_count)
+    plan = prescan_job(mappings, profile)
+    check_job_plan(plan)
+    
+    # Every pair that may take screenshots holds a reference to its source and target until it is written,
+    # a source shared by many targets or mappings is rendered once and released after the last of them
+    if output_backend != "vector":
+        for source_path, target_paths in mappings:
+            for target_path in target_paths:
+                artifacts.retain(source_path, target_path)
+            
+    # Iterate over each pair of source and target files
+    for mapping_index, mapping in enumerate(mappings):
+        source_path, target_paths = mapping
+        check_cancelled(cancel_event)
+        if report is not None:
+            report.start_mapping(source_path, target_paths)
+            report.count("page_count_mismatches", sum(1 for target_path in target_paths if plan.pairs[(source_path, target_path)].count_mismatch))
+
+        input_hashes = {}
+        if journal is not None:
+            # Skip the targets whose output is up to date, before anything is rendered
+            with timed(report, "hash"):
+                input_hashes = {target_path: comparison_input_hashes(source_path, target_path) for target_path in target_paths}
+            current_count = len(target_paths)
+            current_targets = [target_path for target_path in target_paths
+                               if journal.is_current(comparison_output_path(source_path, target_path), input_hashes[target_path], settings)]
+            target_paths = [target_path for target_path in target_paths if target_path not in current_targets]
+            if output_backend != "vector":
+                for target_path in current_targets:
+                    artifacts.release(source_path, target_path)
+            if report is not None:
+                report.count("skipped_unchanged", current_count - len(target_paths))
+            if not target_paths:
+                report_progress(progress, "Skipped, unchanged", mapping_index, mapping_count, 1, 1)
+                continue
+
+        # os.path.basename returns the filename with the extension
+        source_file = os.path.basename(source_path)
+        
+        # Every mapping has its own folder in the workspace, named by position so equal file names cannot collide
+        mapping_folder = f"mapping_{mapping_index + 1:03d}"
+        
+        # source_folder_path is the scratch folder of the source pages of this mapping
+        source_folder_path = workspace.folder(mapping_folder, "source")
+        
+        # (word_file_path, pdf_file_path, target_folder_name, target_path, output_pairs) of the Word documents waiting for conversion
+        pending_conversions = []
+        
+        for target_index, target_path in enumerate(target_paths):
+            target_file = os.path.basename(target_path)
+            
+            # os.path.splitext returns the path and the filename without the extension
+            target_name = os.path.splitext(target_file)[0]
+            # folder_path is the scratch folder of this target, the output is moved to comparison_output_path when done
+            target_folder_name = f"target_{target_index + 1:03d}"
+            folder_path = workspace.folder(mapping_folder, target_folder_name)
+            
+            pdf_file_path = os.path.join(folder_path, source_file)
+            
+            # Large documents are streamed page by page into the comparison PDF instead of being rendered in full first
+            pair_plan = plan.pairs[(source_path, target_path)]
+            streaming = output_backend == "pdf" and max(pair_plan.source_pages, pair_plan.target_pages) >= STREAM_MIN_PAGES
+            
+            if output_backend == "vector":
+                # Embed the original pages as vector content, nothing is rendered; pages are paired like in the rendered mode,
+                # by content when the page counts differ, with a blank page opposite an unpaired page
+                report_progress(progress, "Embedding pages", mapping_index, mapping_count)
+                with timed(report, "align"):
+                    alignment = page_alignment(source_path, target_path, pair_plan.source_pages, pair_plan.target_pages)
+                vector_pairs = select_pairs(alignment, page_selection)
+                if vector_pairs:
+                    with timed(report, "write_vector_pdf"):
+                        create_alternating_vector_pdf(source_path, target_path, pdf_file_path, vector_pairs)
+                        label_comparison_pages(pdf_file_path, vector_pairs)
+                    publish_output(pdf_file_path, source_path, target_path)
+                else:
+                    remove_stale_output(source_path, target_path)
+                record_completed_output(journal, source_path, target_path, input_hashes, settings, bool(vector_pairs))
+                continue
+            
+            # (source_index, target_index) pairs left by the page selection and the text filter, None when every pair is compared
+            text_alignment = None
+            if page_selection is not None or text_filter is not None:
+                with timed(report, "align"):
+                    alignment = page_alignment(source_path, target_path, pair_plan.source_pages, pair_plan.target_pages)
+                text_alignment = select_pairs(alignment, page_selection)
+                if report is not None:
+                    report.count("pages_skipped_by_selection", len(alignment) - len(text_alignment))
+            if text_filter is not None and text_alignment:
+                # Compare the text layers first, only the page pairs whose text differs enough are rendered
+                report_progress(progress, "Comparing page texts", mapping_index, mapping_count)
+                with timed(report, "text_diff", len(text_alignment)):
+                    text_diffs = compare_page_texts(source_path, target_path, text_alignment)
+                text_alignment = pairs_to_render(text_diffs, text_filter)
+                if report is not None:
+                    report.flag_pages("identical_text", target_path, identical_text_pages(text_diffs))
+                    report.count("pages_skipped_by_text", len(text_diffs) - len(text_alignment))
+            if text_alignment is not None and not text_alignment:
+                # No selected page, or every page has the same text, there is nothing to render
+                with timed(report, "cleanup"):
+                    workspace.remove_folder(mapping_folder, target_folder_name)
+                artifacts.release(source_path, target_path)
+                remove_stale_output(source_path, target_path)
+                record_completed_output(journal, source_path, target_path, input_hashes, settings, output_written=False)
+                continue
+            
+            if streaming:
+                pair_progress = lambda done, total: report_progress(progress, "Streaming comparison PDF", mapping_index, mapping_count, done, total)
+                output_pairs = []
+                pages = iter_comparison_pages(source_path, target_path, diff_pages, pair_progress, cancel_event, profile, text_alignment, output_pairs, layout,
+                                              artifacts.render_cache)
+                with timed(report, "stream_pdf"):
+                    written_pages = write_alternating_pdf_stream(pages, pdf_file_path, sections=not composite)
+                if written_pages:
+                    label_comparison_pages(pdf_file_path, output_pairs, composite)
+                    publish_output(pdf_file_path, source_path, target_path)
+                else:
+                    remove_stale_output(source_path, target_path)
+                artifacts.release(source_path, target_path)
+                record_completed_output(journal, source_path, target_path, input_hashes, settings, bool(written_pages))
+                continue
+            
+            # With a page selection or a text filter only the pages of the remaining pairs are rendered
+            source_pages = target_pages = None
+            if text_alignment is not None:
+                source_pages = sorted({source_index for source_index, _ in text_alignment if source_index is not None})
+                target_pages = sorted({target_index for _, target_index in text_alignment if target_index is not None})
+            
+            # Take screenshots of all pages for source documents, the first pair of the run that needs them renders them
+            render_progress = lambda done, total: report_progress(progress, "Rendering source pages", mapping_index, mapping_count, done, total)
+            source_page_sizes, source_whole_path = take_screenshots_source(source_folder_path, source_path, "source", workers, render_progress, cancel_event, profile, report,
+                                                                           source_pages, artifacts)
+             
+            # Take screenshots of all pages for target documents
+            render_progress = lambda done, total: report_progress(progress, "Rendering target pages", mapping_index, mapping_count, done, total)
+            page_sizes, target_whole_path = take_screenshots_target(folder_path, target_path, "target", workers, render_progress, cancel_event, profile, report,
+                                                                    target_pages, artifacts)
+            
+            # output_pairs are the (source_index, target_index) pairs written, in order, for the page labels
+            pair_source_path = source_whole_path
+            output_pairs = [(page_num, page_num) for page_num in range(len(source_whole_path))]
+            if text_alignment is not None:
+                # Only the pairs left by the selection and the text filter, with a blank page opposite an unpaired page
+                output_pairs = text_alignment
+                pair_source_path, target_whole_path, page_sizes = aligned_image_pairs(text_alignment, source_whole_path, target_whole_path, source_page_sizes, page_sizes, folder_path)
+            elif len(source_whole_path) != len(target_whole_path):
+                # The page counts differ, pair the pages by content so inserted or deleted pages do not shift every later pair
+                report_progress(progress, "Aligning pages", mapping_index, mapping_count)
+                with timed(report, "align"):
+                    output_pairs = align_pdf_pages(source_path, target_path)
+                pair_source_path, target_whole_path, page_sizes = aligned_image_pairs(output_pairs, source_whole_path, target_whole_path, source_page_sizes, page_sizes, folder_path)
+            
+            if diff_pages:
+                # Keep only the page pairs that differ, with the changed regions highlighted on the target pages
+                report_progress(progress, "Comparing pages", mapping_index, mapping_count)
+                with timed(report, "diff", len(page_sizes)):
+                    paired_source_path = pair_source_path
+                    pair_source_path, target_whole_path, page_sizes, _ = filter_changed_pages(pair_source_path, target_whole_path, page_sizes, folder_path)
+                # Every pair has its own source image (or blank page), the kept ones tell which pairs are left
+                changed_source_paths = set(pair_source_path)
+                output_pairs = [pair for pair, path in zip(output_pairs, paired_source_path) if path in changed_source_paths]
+                if not page_sizes:
+                    # Identical documents, there is nothing to compare
+                    with timed(report, "cleanup"):
+                        workspace.remove_folder(mapping_folder, target_folder_name)
+                    artifacts.release(source_path, target_path)
+                    remove_stale_output(source_path, target_path)
+                    record_completed_output(journal, source_path, target_path, input_hashes, settings, output_written=False)
+                    continue
+            
+            all_image_path = [img for pair in zip(pair_source_path, target_whole_path) for img in pair]                     
+            
+            doubled_page_sizes = [size for page_size in page_sizes for size in [page_size, page_size]]
+            
+            # Last chance to stop before the output is written
+            check_cancelled(cancel_event)
+            
+            if output_backend == "pdf":
+                # Write the comparison PDF directly, without the Word document and docx2pdf round trip
+                report_progress(progress, "Writing comparison PDF", mapping_index, mapping_count)
+                with timed(report, "write_pdf", len(all_image_path)):
+                    if composite:
+                        # One page per pair, with the source and the target image on it
+                        create_composite_pdf(pair_source_path, target_whole_path, pdf_file_path, layout, profile_zoom(profile))
+                    else:
+                        create_alternating_pdf(page_sizes, all_image_path, doubled_page_sizes, pdf_file_path)
+                    label_comparison_pages(pdf_file_path, output_pairs, composite)
+                publish_output(pdf_file_path, source_path, target_path)
+                
+                # Remove the scratch files of this target
+                with timed(report, "cleanup"):
+                    workspace.remove_folder(mapping_folder, target_folder_name)
+                artifacts.release(source_path, target_path)
+                record_completed_output(journal, source_path, target_path, input_hashes, settings)
+                continue
+            
+            word_file_path = os.path.join(folder_path, f"{target_name}.docx")
+            
+            if composite:
+                # One picture per pair, source and target joined into a single image
+                with timed(report, "composite", len(page_sizes)):
+                    all_image_path, page_sizes = composite_image_pairs(pair_source_path, target_whole_path, folder_path, layout, profile_zoom(profile), profile)
+                doubled_page_sizes = page_sizes
+            
+            # Create Word document with alternating screenshots
+            report_progress(progress, "Building Word document", mapping_index, mapping_count)
+            with timed(report, "build_docx", len(all_image_path)):
+                create_alternating_word_doc(page_sizes, all_image_path, doubled_page_sizes, word_file_path)
+                    
+            # Remove existing PNG files, the rendered pages are no longer needed by this pair
+            with timed(report, "cleanup"):
+                remove_png_files(folder_path)    
+            artifacts.release(source_path, target_path)
+    
+            # Converted to PDF together with the other targets of this source
+            pending_conversions.append((word_file_path, pdf_file_path, target_folder_name, target_path, output_pairs))
+        
+        if pending_conversions:
+            # Convert to PDF
+            report_progress(progress, "Converting to PDF", mapping_index, mapping_count)
+            with timed(report, "word_to_pdf", len(pending_conversions)):
+                failed_conversions = dict(get_word_converter(word_converter).convert_batch([(word_file_path, pdf_file_path)
+                                                                                            for word_file_path, pdf_file_path, _, _, _ in pending_conversions]))
+            for word_file_path, pdf_file_path, target_folder_name, target_path, output_pairs in pending_conversions:
+                error = failed_conversions.get(word_file_path)
+                if error is None and not os.path.exists(pdf_file_path):
+                    error = "the converter wrote no PDF"
+                if error is None:
+                    label_comparison_pages(pdf_file_path, output_pairs, composite)
+                    publish_output(pdf_file_path, source_path, target_path)
+                with timed(report, "cleanup"):
+                    workspace.remove_folder(mapping_folder, target_folder_name)
+                # A conversion that wrote no PDF is not recorded, the next run tries the pair again
+                if error is None:
+                    record_completed_output(journal, source_path, target_path, input_hashes, settings)
+                else:
+                    conversion_failures.append((source_path, target_path, error))
+                    if report is not None:
+                        report.count("conversion_failures")
+            
+        # Remove the scratch files of this mapping
+        with timed(report, "cleanup"):
+            workspace.remove_folder(mapping_folder)
+        report_progress(progress, "Finished", mapping_index, mapping_count, 1, 1)
+
+    if conversion_failures:
+        raise WordConversionError("Could not convert the comparisons of " + "; ".join(
+            f"{os.path.basename(source_path)} -> {os.path.basename(target_path)}: {error}" for source_path, target_path, error in conversion_failures),
+            conversion_failures)
+
+def publish_output(pdf_file_path, source_path, target_path):
+    """Move a finished comparison PDF from the workspace to its output path, if one was written."""
+    if os.path.exists(pdf_file_path):
+        publish_file(pdf_file_path, comparison_output_path(source_path, target_path))
+
+def remove_stale_output(source_path, target_path):
+    """Remove the output an earlier run left for a pair that completes without an output this time, e.g. no page changed."""
+    output_path = comparison_output_path(source_path, target_path)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+def page_alignment(source_path, target_path, source_page_count, target_page_count):
+    """Return the (source_index, target_index) page pairs of two documents, aligned by content when the counts differ."""
+    if source_page_count == target_page_count:
+        return [(page_num, page_num) for page_num in range(source_page_count)]
+    return align_pdf_pages(source_path, target_path)
+
+def iter_comparison_pages(source_path, target_path, diff_pages=False, progress=None, cancel_event=None, quality=None, alignment=None,
+                          output_pairs=None, layout=DEFAULT_LAYOUT, cache=None):
+    """Yield the alternating (page_size, image) pages of a comparison, one rendered page pair at a time.
+
+    Pages are paired like in the rendered mode: by content when the page counts differ, with a blank page (None)
+    opposite an unpaired page. With diff_pages, identical pairs are dropped and the changes are highlighted.
+    progress(done, total) is called after every page pair.
+    The images are pixmaps, or encoded image bytes when the quality profile uses JPEG.
+    alignment gives the (source_index, target_index) pairs to write instead, e.g. the pairs left by a text filter.
+    output_pairs, a list, receives the (source_index, target_index) of every pair that is written.
+    With a composite layout (side_by_side or stacked) one page is yielded per pair, with both pages on it.
+    cache is the RenderCache the pages are read from and stored in, default the shared render_cache.
+    """
+    profile = get_quality_profile(quality)
+    if cache is None:
+        cache = render_cache
+    with fitz.open(source_path) as source_doc, fitz.open(target_path) as target_doc:
+        source_page_sizes = [(page.rect.width, page.rect.height) for page in source_doc]
+        target_page_sizes = [(page.rect.width, page.rect.height) for page in target_doc]
+    if alignment is None:
+        alignment = page_alignment(source_path, target_path, len(source_page_sizes), len(target_page_sizes))
+
+    # Both documents are rendered ahead on their own thread, each through a small bounded queue
+    source_pages = iter_rendered_pages(source_path, [source_index for source_index, _ in alignment if source_index is not None],
+                                       render_cache=cache, file_hash=file_hash(source_path), cancel_event=cancel_event, quality=profile)
+    target_pages = iter_rendered_pages(target_path, [target_index for _, target_index in alignment if target_index is not None],
+                                       render_cache=cache, file_hash=file_hash(target_path), cancel_event=cancel_event, quality=profile)
+    try:
+        for pair_index, (source_index, target_index) in enumerate(alignment):
+            source = next(source_pages)[1] if source_index is not None else None
+            target = next(target_pages)[1] if target_index is not None else None
+            page_size = target_page_sizes[target_index] if target_index is not None else source_page_sizes[source_index]
+            
+            if diff_pages and source is not None and target is not None:
+                target_array = pixmap_to_array(target)
+                page_diff = diff_page_arrays(pixmap_to_array(source), target_array)
+                if page_diff.score <= MIN_CHANGE_SCORE:
+                    if progress is not None:
+                        progress(pair_index + 1, len(alignment))
+                    continue
+                if target.n == 1:
+                    # Grayscale page, the highlight needs color
+                    target = fitz.Pixmap(fitz.csRGB, target)
+                    target_array = pixmap_to_array(target)
+                highlighted = highlight_boxes(target_array, page_diff.boxes)
+                target = fitz.Pixmap(target.colorspace, target.width, target.height, highlighted.tobytes(), target.alpha)
+            
+            if output_pairs is not None:
+                output_pairs.append((source_index, target_index))
+            if layout != DEFAULT_LAYOUT:
+                composite_page, composite_size = composite_pixmap(source, target, layout, profile_zoom(profile))
+                yield composite_size, encode_pixmap(composite_page, profile)
+                if progress is not None:
+                    progress(pair_index + 1, len(alignment))
+                continue
+            yield page_size, encode_pixmap(source, profile) if source is not None else None
+            yield page_size, encode_pixmap(target, profile) if target is not None else None
+            if progress is not None:
+                progress(pair_index + 1, len(alignment))
+        check_cancelled(cancel_event)
+    finally:
+        source_pages.close()
+        target_pages.close()
+
+def remove_Word_file(folder_path):
+    for root, dirs, files in os.walk(folder_path):   
+        for file in files:
+            if file.endswith(".docx"):
+                os.remove(os.path.join(root, file))
+
+def convert_word_to_pdf(word_file_path, pdf_file_path, word_converter=None):
+    # The converter (and for LibreOffice its worker processes) is started on first use and shared by later calls
+    get_word_converter(word_converter).convert(word_file_path, pdf_file_path)
+
+  
+def take_screenshots_source(source_folder_path, source_path, prefix, workers=None, progress=None, cancel_event=None, quality=None, report=None,
+                            page_numbers=None, artifacts=None):  
+
+    # Compute the hash of the PDF file, the artifact store keys the rendered documents by it
+    with timed(report, "hash"):
+        file_hash(source_path)
+    
+    # Without a store of the run, only the persistent render cache is shared
+    if artifacts is None:
+        artifacts = RenderArtifactStore(render_cache, get_quality_profile(quality))
+    
+    # Render the pages no earlier pair of the run rendered, the others come from the store
+    return artifacts.acquire(source_path, source_folder_path, prefix, page_numbers, workers, progress, cancel_event, report)
+    
+def take_screenshots_target(folder_path, target_path, prefix, workers=None, progress=None, cancel_event=None, quality=None, report=None,
+                            page_numbers=None, artifacts=None):  
+
+    # Compute the hash of the PDF file, the artifact store keys the rendered documents by it
+    with timed(report, "hash"):
+        file_hash(target_path)
+    
+    # Without a store of the run, only the persistent render cache is shared
+    if artifacts is None:
+        artifacts = RenderArtifactStore(render_cache, get_quality_profile(quality))
+    
+    # Render the pages no earlier pair of the run rendered, the others come from the store
+    return artifacts.acquire(target_path, folder_path, prefix, page_numbers, workers, progress, cancel_event, report)
+        
+def create_alternating_word_doc(page_sizes, all_image_path, doubled_page_sizes, word_file_path):
+
+    # Determine the layout for the first image in the images list
+    first_page_landscape = check_first_image_layout(page_sizes)
+    
+    # first_image = check_first_image_layout(page_sizes) 
+    
+    if first_page_landscape == False:
+        create_word_document_first_portrait(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path, page_sizes)
+        return first_page_landscape
+    else:
+        create_word_document_first_landscape(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path)
+        return first_page_landscape
+    
+def check_first_image_layout(page_sizes):
+     if page_sizes:
+         first_image = page_sizes[0]
+         width, height = first_image
+         return width > height  # True if landscape, False if portrait
+     else:
+         return None  # Return None for an empty image list 
+     return first_image
+
+def create_word_document_first_portrait(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path, page_sizes):
+    doc = Document()
+    sections = doc.sections
+    landscape_page = first_page_landscape
+    # The first section takes the size of the first page, straight from page.rect, no extra 72 DPI render needed
+    first_image_width, first_image_height = page_sizes[0]
+    
+    # Set margins to zero (remove margins)
+    for section in sections:
+        section.left_margin = section.right_margin = section.top_margin = section.bottom_margin = Inches(0)
+
+    section.page_width = Pt(first_image_width)
+    section.page_height = Pt(first_image_height)
+
+    for image, page_size in zip(all_image_path, doubled_page_sizes):
+        width, height = page_size
+            
+        if width > height:  # Check if width > height (indicating landscape layout)
+            if landscape_page == False:
+                section = doc.add_section(WD_ORIENT.LANDSCAPE)
+            section.page_width = Pt(width)
+            section.page_height = Pt(height)
+            landscape_page = True    
+        else:
+            if landscape_page == True:
+                section = doc.add_section(WD_ORIENT.PORTRAIT)
+                section.page_width = Pt(width)
+                section.page_height = Pt(height)
+            landscape_page = False
+
+           
+        doc.add_picture(image, width=Pt(width)) # Set picture width based on image width
+
+    doc.save(word_file_path)    
+            
+        
+def create_word_document_first_landscape(first_page_landscape, all_image_path, doubled_page_sizes, word_file_path):
+    doc = Document()
+    sections = doc.sections
+    section = doc.sections[-1]
+    landscape_page = first_page_landscape
+    image_number = 1
+    
+
+    for image, page_size in zip(all_image_path, doubled_page_sizes):
+        width, height = page_size  
+
+        if image_number == 1:
+            section.page_width = Pt(width)
+            section.page_height = Pt(height)
+       
+        if width > height:  # Check if width > height (indicating landscape layout)
+            if landscape_page == False:
+                section = doc.add_section(WD_ORIENT.LANDSCAPE)
+                section.page_width = Pt(width)
+                section.page_height = Pt(height)
+            landscape_page = True    
+        else:
+            if landscape_page == True:
+                section = doc.add_section(WD_ORIENT.PORTRAIT)
+            section.page_width = Pt(width)
+            section.page_height = Pt(height)
+            landscape_page = False
+        
+        doc.add_picture(image, width=Pt(width)) # Set picture width based on image width
+
+        image_number += 1
+
+    # Set margins to zero (remove margins)
+    for section in sections:
+        section.left_margin = section.right_margin = section.top_margin = section.bottom_margin = Inches(0) 
+        
+    doc.save(word_file_path)
+    
+
+def remove_png_files(folder_path):
+    for root, dirs, files in os.walk(folder_path, topdown=False):      
+        for file in files:
+            if file.endswith((".png", ".jpg")):
+                os.remove(os.path.join(root, file))
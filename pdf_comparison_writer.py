@@ -0,0 +1,235 @@
+"""
+Native PDF output for the PDF comparison tools.
+Writes the alternating source/target comparison PDF directly with PyMuPDF, without building a Word document
+and converting it with docx2pdf, so it needs no Microsoft Word and runs headless on Linux.
+The page sizes follow the same section logic as create_word_document_first_portrait / create_word_document_first_landscape.
+The vector mode embeds the original pages instead of screenshots, so nothing is rendered at all.
+write_alternating_pdf_stream writes pages as they are rendered, for documents too large to render in full first.
+label_comparison_pages gives every page of a written comparison the original page number it shows as its PDF page
+label ("Source 12", "Target 14", or "Source 12, Target 14" for a composite page with both), so selected or filtered
+pages can still be found in the documents.
+"""
+
+import os
+import uuid
+import shutil
+import tempfile
+import fitz  # PyMuPDF
+
+# The streaming writer fills a small document with this many pages at a time and saves it, compressed, to a chunk
+# file; PyMuPDF keeps inserted images uncompressed until a document is saved
+STREAM_CHUNK_PAGES = 16
+
+
+def check_first_image_layout(page_sizes):
+    if page_sizes:
+        width, height = page_sizes[0]
+        return width > height  # True if landscape, False if portrait
+    else:
+        return None  # Return None for an empty page list
+
+
+def plan_sections(first_page_landscape, doubled_page_sizes, first_page_size=None):
+    """Replay the Word section logic and return the page size every image ends up on.
+
+    In the Word documents a new section only starts when the orientation switches, and a page size assigned to a
+    section applies to every image in it, so the size of a section is the last one assigned to it.
+    """
+    landscape_page = first_page_landscape
+    # Each section is [page_size, image indices]; a new section starts with the size of the previous one
+    sections = [[first_page_size, []]]
+
+    for image_number, (width, height) in enumerate(doubled_page_sizes):
+        section = sections[-1]
+
+        if first_page_landscape:
+            # create_word_document_first_landscape
+            if image_number == 0:
+                section[0] = (width, height)
+            if width > height:
+                if landscape_page == False:
+                    section = [section[0], []]
+                    sections.append(section)
+                    section[0] = (width, height)
+                landscape_page = True
+            else:
+                if landscape_page == True:
+                    section = [section[0], []]
+                    sections.append(section)
+                section[0] = (width, height)
+                landscape_page = False
+        else:
+            # create_word_document_first_portrait
+            if width > height:
+                if landscape_page == False:
+                    section = [section[0], []]
+                    sections.append(section)
+                section[0] = (width, height)
+                landscape_page = True
+            else:
+                if landscape_page == True:
+                    section = [section[0], []]
+                    sections.append(section)
+                    section[0] = (width, height)
+                landscape_page = False
+
+        section[1].append(image_number)
+
+    image_page_sizes = [None] * len(doubled_page_sizes)
+    for page_size, image_numbers in sections:
+        for image_number in image_numbers:
+            image_page_sizes[image_number] = page_size
+    return image_page_sizes
+
+
+def create_alternating_pdf(page_sizes, all_image_path, doubled_page_sizes, pdf_file_path):
+    """Write the alternating source/target screenshots straight into a PDF file."""
+    first_page_landscape = check_first_image_layout(page_sizes)
+    first_page_size = page_sizes[0] if page_sizes else None
+    image_page_sizes = plan_sections(first_page_landscape, doubled_page_sizes, first_page_size)
+
+    doc = fitz.open()
+    for image, (width, height) in zip(all_image_path, image_page_sizes):
+        page = doc.new_page(width=width, height=height)
+        # Zero margins, the picture fills the page width like doc.add_picture(image, width=Pt(width))
+        page.insert_image(page.rect, filename=image)
+
+    doc.save(pdf_file_path, garbage=3, deflate=True)
+    doc.close()
+
+
+def write_alternating_pdf_stream(pages, pdf_file_path, chunk_pages=STREAM_CHUNK_PAGES, sections=True):
+    """Write alternating source/target pages to a PDF as they arrive and return the number of pages written.
+
+    pages yields (page_size, image) with image a fitz Pixmap, encoded image bytes, or None for a blank page. Every image is placed at its
+    own page size; once all sizes are known, the pages are resized to their Word section sizes, anchored at the top
+    left like doc.add_picture. Without sections, e.g. for composite pages, every page keeps its own size.
+    Every chunk of pages is saved to its own file as soon as it is full, and the chunks are then appended one at a
+    time to the output with incremental saves, so only one chunk is ever held in memory however many pages there are.
+    Nothing is written when pages yields nothing.
+    """
+    chunk_folder = tempfile.mkdtemp(prefix="chunks_", dir=os.path.dirname(os.path.abspath(pdf_file_path)))
+    # Write under a temporary name and move it into place, an interrupted run never leaves half a PDF
+    temp_path = f"{pdf_file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        chunk_paths = []
+        doubled_page_sizes = []
+        chunk = fitz.open()
+        for (width, height), image in pages:
+            page = chunk.new_page(width=width, height=height)
+            if isinstance(image, bytes):
+                page.insert_image(page.rect, stream=image)
+            elif image is not None:
+                page.insert_image(page.rect, pixmap=image)
+            doubled_page_sizes.append((width, height))
+            if chunk.page_count >= chunk_pages:
+                _save_chunk(chunk, chunk_folder, chunk_paths)
+                chunk = fitz.open()
+        _save_chunk(chunk, chunk_folder, chunk_paths)
+
+        if not doubled_page_sizes:
+            return 0
+
+        # The section sizes only need the page sizes, the pages themselves stay in the chunk files
+        first_page_size = doubled_page_sizes[0]
+        image_page_sizes = plan_sections(check_first_image_layout([first_page_size]), doubled_page_sizes, first_page_size) if sections else doubled_page_sizes
+        page_num = 0
+        for chunk_path in chunk_paths:
+            with fitz.open(chunk_path) as chunk:
+                for page in chunk:
+                    (width, height), (section_width, section_height) = doubled_page_sizes[page_num], image_page_sizes[page_num]
+                    if (width, height) != (section_width, section_height):
+                        # The media box is in PDF coordinates (origin bottom left), keep the top edge where it is
+                        page.set_mediabox(fitz.Rect(0, height - section_height, section_width, height))
+                    page_num += 1
+                if not os.path.exists(temp_path):
+                    chunk.save(temp_path, garbage=3, deflate=True)
+                    continue
+                with fitz.open(temp_path) as doc:
+                    doc.insert_pdf(chunk)
+                    doc.saveIncr()
+                fitz.TOOLS.store_shrink(100)
+        os.replace(temp_path, pdf_file_path)
+        return len(doubled_page_sizes)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        shutil.rmtree(chunk_folder, ignore_errors=True)
+
+
+def _save_chunk(chunk, chunk_folder, chunk_paths):
+    if chunk.page_count:
+        # Saving compresses the images, PyMuPDF keeps inserted images uncompressed until a document is saved
+        chunk_path = os.path.join(chunk_folder, f"chunk_{len(chunk_paths):05d}.pdf")
+        chunk.save(chunk_path, garbage=3, deflate=True)
+        chunk_paths.append(chunk_path)
+    chunk.close()
+    # MuPDF keeps decoded images and fonts of closed documents in its global store (up to 256 MB), empty it so the
+    # memory of a chunk goes with it
+    fitz.TOOLS.store_shrink(100)
+
+
+def create_alternating_vector_pdf(source_path, target_path, pdf_file_path, pairs=None):
+    """Write the alternating comparison PDF by embedding the original pages as vector content.
+
+    No page is rasterized: every source and target page is placed on its output page as a PDF form, so text stays
+    searchable and each distinct page is stored only once.
+    pairs gives the (source_index, target_index) page pairs to write, default every page pair by position. A side that
+    is None (a page inserted or deleted in the target) gets a blank page the size of the other side.
+    """
+    source_doc = fitz.open(source_path)
+    target_doc = fitz.open(target_path)
+
+    if pairs is None:
+        pairs = list(zip(range(source_doc.page_count), range(target_doc.page_count)))
+    alternating_pages = []
+    alternating_page_sizes = []
+    for source_num, target_num in pairs:
+        # The blank placeholder of an unpaired page takes the size of the page opposite it
+        paired_rect = source_doc[source_num].rect if source_num is not None else target_doc[target_num].rect
+        for doc, page_num in [(source_doc, source_num), (target_doc, target_num)]:
+            rect = doc[page_num].rect if page_num is not None else paired_rect
+            alternating_pages.append((doc, page_num))
+            alternating_page_sizes.append((rect.width, rect.height))
+    image_page_sizes = plan_sections(check_first_image_layout(alternating_page_sizes), alternating_page_sizes,
+                                     alternating_page_sizes[0] if alternating_page_sizes else None)
+
+    doc = fitz.open()
+    for (embedded_doc, page_num), (width, height) in zip(alternating_pages, image_page_sizes):
+        page = doc.new_page(width=width, height=height)
+        if page_num is not None:
+            page.show_pdf_page(page.rect, embedded_doc, page_num)
+
+    doc.save(pdf_file_path, garbage=3, deflate=True)
+    doc.close()
+    source_doc.close()
+    target_doc.close()
+
+
+def comparison_page_labels(pairs, composite=False):
+    """Return the label of every page of a comparison of the (source_index, target_index) pairs.
+
+    An alternating comparison has a page for each side of a pair, a composite one page per pair.
+    """
+    labels = [[f"{side} {page_num + 1}" if page_num is not None else f"{side} blank"
+               for side, page_num in [("Source", source_index), ("Target", target_index)]]
+              for source_index, target_index in pairs]
+    if composite:
+        return [", ".join(pair_labels) for pair_labels in labels]
+    return [label for pair_labels in labels for label in pair_labels]
+
+
+def label_comparison_pages(pdf_file_path, pairs, composite=False):
+    """Set the PDF page labels of a written comparison to the original page numbers of its (source_index, target_index) pairs.
+
+    Nothing is changed when the page count of the PDF does not match the pairs, e.g. after Word moved a picture.
+    """
+    labels = comparison_page_labels(pairs, composite)
+    with fitz.open(pdf_file_path) as doc:
+        if doc.page_count != len(labels):
+            return False
+        # One labelling range per page, a label without a numbering style is just its prefix
+        doc.set_page_labels([{"startpage": page_num, "prefix": label, "style": "", "firstpagenum": 1}
+                             for page_num, label in enumerate(labels)])
+        doc.saveIncr()
+    return True
@@ -0,0 +1,78 @@
+"""
+Job journal for resumable, incremental comparison runs.
+Records every completed comparison output together with the hashes of its input PDFs and the render settings.
+On the next run, a mapping whose inputs and settings are unchanged (and whose output is still in place) is skipped,
+so an interrupted batch resumes where it stopped and a re-delivered target only regenerates its own output.
+The journal is a JSON file that is rewritten atomically after every completed output; entries written in the meantime
+by another run sharing the journal are merged in first, so parallel runs do not drop each other's records.
+"""
+
+import os
+import json
+import uuid
+
+# Default file name of the journal, kept next to the comparison outputs
+JOURNAL_FILE_NAME = "comparison_journal.json"
+
+
+class JobJournal:
+    def __init__(self, journal_path=JOURNAL_FILE_NAME):
+        self.journal_path = os.path.abspath(journal_path)
+        self.entries = {}
+        # Outputs recorded by this run, they win over the journal on disk when saving
+        self.recorded = set()
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("outputs", {})
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError):
+            # A damaged journal only costs a full rerun
+            self.entries = {}
+
+    def is_current(self, output_path, input_hashes, settings):
+        """Return True when output_path was completed from the same inputs and settings and is still untouched."""
+        entry = self.entries.get(os.path.abspath(output_path))
+        if entry is None or entry["inputs"] != input_hashes or entry["settings"] != settings:
+            return False
+        if entry["size"] is None:
+            # The run completed without writing an output, e.g. no page changed
+            return not os.path.exists(output_path)
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return False
+        return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+
+    def record(self, output_path, input_hashes, settings, output_written=True):
+        """Record a completed output (which may legitimately not exist) and save the journal right away.
+
+        With output_written False the run completed without an output (e.g. no page changed), whatever file is at
+        output_path is not taken for it. With output_written True the output must exist, a missing output is never
+        recorded as a completed run without output.
+        """
+        size, mtime = None, None
+        if output_written:
+            stat = os.stat(output_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        self.recorded.add(os.path.abspath(output_path))
+        self.entries[os.path.abspath(output_path)] = {
+            "inputs": input_hashes,
+            "settings": settings,
+            "size": size,
+            "mtime": mtime,
+        }
+        self.save()
+
+    def save(self):
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                on_disk = json.load(f).get("outputs", {})
+            self.entries = {**on_disk, **{path: self.entries[path] for path in self.recorded}}
+        except (OSError, ValueError, AttributeError):
+            pass
+        # Write under a temporary name and move it into place, an interruption never leaves half a journal
+        temp_path = f"{self.journal_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"outputs": self.entries}, f, indent=2)
+        os.replace(temp_path, self.journal_path)
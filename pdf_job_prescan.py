@@ -0,0 +1,120 @@
+"""
+Metadata-only prescan of comparison jobs.
+Opens every mapped PDF and reads only its page count and page rectangles; nothing is rendered, so a whole job is
+checked in milliseconds. Missing, unreadable, password protected or empty documents fail the job before the first
+page is rendered, page count and orientation mismatches are flagged, the render cost is estimated (pages and
+megapixels at the DPI of the quality profile) and the orientation switches of the Word section layout are counted
+from the page sizes alone.
+"""
+
+import os
+from collections import namedtuple
+import fitz  # PyMuPDF
+from pdf_comparison_writer import check_first_image_layout, plan_sections
+from pdf_quality_profiles import get_quality_profile, profile_zoom
+
+DocumentScan = namedtuple("DocumentScan", ["path", "page_sizes", "error"])
+
+# orientation_switches counts the section breaks of the Word layout of the comparison, as plan_sections lays it out;
+# for pairs with different page counts it is provisional, the alignment can still pair the pages differently
+PairPlan = namedtuple("PairPlan", ["source", "target", "source_pages", "target_pages", "count_mismatch", "orientation_mismatches",
+                                   "orientation_switches", "megapixels"])
+
+JobPlan = namedtuple("JobPlan", ["documents", "pairs", "problems", "dpi", "total_pages", "megapixels"])
+
+
+class PrescanError(ValueError):
+    """Raised before anything is rendered when mapped documents cannot be compared."""
+
+
+def scan_document(pdf_path):
+    """Return the DocumentScan of a PDF: its page sizes in points, or the reason it cannot be compared."""
+    if not os.path.isfile(pdf_path):
+        return DocumentScan(pdf_path, [], "file not found")
+    try:
+        with fitz.open(pdf_path) as pdf_file:
+            if not pdf_file.is_pdf:
+                return DocumentScan(pdf_path, [], "not a PDF file")
+            if pdf_file.needs_pass:
+                return DocumentScan(pdf_path, [], "the PDF is password protected")
+            page_sizes = [(page.rect.width, page.rect.height) for page in pdf_file]
+    except Exception as e:
+        return DocumentScan(pdf_path, [], f"cannot be opened ({e})")
+    if not page_sizes:
+        return DocumentScan(pdf_path, [], "the PDF has no pages")
+    return DocumentScan(pdf_path, page_sizes, None)
+
+
+def estimate_megapixels(page_sizes, zoom):
+    """Return the number of megapixels rendering these pages at the given zoom produces."""
+    return sum(width * zoom * height * zoom for width, height in page_sizes) / 1e6
+
+
+def layout_plan(page_sizes):
+    """Return the page size of every image of an alternating comparison of pages with these sizes."""
+    doubled_page_sizes = [size for page_size in page_sizes for size in [page_size, page_size]]
+    return plan_sections(check_first_image_layout(page_sizes), doubled_page_sizes, page_sizes[0] if page_sizes else None)
+
+
+def plan_pair(source_scan, target_scan, zoom):
+    source_sizes, target_sizes = source_scan.page_sizes, target_scan.page_sizes
+    # The comparison pages take the size of the target pages, like in the pipeline
+    image_page_sizes = layout_plan(target_sizes)
+    orientation_mismatches = []
+    if len(source_sizes) == len(target_sizes):
+        # Pages are only paired by position when the counts match, otherwise the alignment pairs them later
+        orientation_mismatches = [page_num + 1 for page_num, ((source_width, source_height), (target_width, target_height))
+                                  in enumerate(zip(source_sizes, target_sizes))
+                                  if (source_width > source_height) != (target_width > target_height)]
+    orientation_switches = sum(1 for previous, current in zip(image_page_sizes, image_page_sizes[1:])
+                               if (previous[0] > previous[1]) != (current[0] > current[1]))
+    return PairPlan(source_scan.path, target_scan.path, len(source_sizes), len(target_sizes), len(source_sizes) != len(target_sizes),
+                    orientation_mismatches, orientation_switches,
+                    estimate_megapixels(source_sizes, zoom) + estimate_megapixels(target_sizes, zoom))
+
+
+def prescan_job(mappings, quality=None):
+    """Scan every document of the (source_path, [target_paths]) mappings and return the JobPlan of the job.
+
+    problems lists every document that cannot be compared; pairs maps (source_path, target_path) to its PairPlan,
+    for the pairs whose documents are both fine. total_pages and megapixels count every document once, like the
+    render cache renders it once.
+    """
+    profile = get_quality_profile(quality)
+    zoom = profile_zoom(profile)
+    documents = {}
+    for source_path, target_paths in mappings:
+        for path in [source_path] + list(target_paths):
+            if path not in documents:
+                documents[path] = scan_document(path)
+
+    problems = [f"{os.path.basename(scan.path)}: {scan.error}" for scan in documents.values() if scan.error]
+    pairs = {}
+    for source_path, target_paths in mappings:
+        for target_path in target_paths:
+            if documents[source_path].error is None and documents[target_path].error is None:
+                pairs[(source_path, target_path)] = plan_pair(documents[source_path], documents[target_path], zoom)
+
+    return JobPlan(documents, pairs, problems, profile.dpi,
+                   sum(len(scan.page_sizes) for scan in documents.values()),
+                   sum(estimate_megapixels(scan.page_sizes, zoom) for scan in documents.values()))
+
+
+def check_job_plan(plan):
+    """Raise PrescanError listing every document of the plan that cannot be compared."""
+    if plan.problems:
+        raise PrescanError("These documents cannot be compared:\n" + "\n".join(plan.problems))
+
+
+def job_plan_summary(plan):
+    """Return a JobPlan as a JSON-ready dictionary, without the scans of the documents."""
+    return {
+        "dpi": plan.dpi,
+        "total_pages": plan.total_pages,
+        "megapixels": round(plan.megapixels, 1),
+        "problems": plan.problems,
+        "pairs": [{"source": pair.source, "target": pair.target, "source_pages": pair.source_pages, "target_pages": pair.target_pages,
+                   "count_mismatch": pair.count_mismatch, "orientation_mismatches": pair.orientation_mismatches,
+                   "orientation_switches": pair.orientation_switches, "megapixels": round(pair.megapixels, 1)}
+                  for pair in plan.pairs.values()],
+    }
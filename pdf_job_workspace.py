@@ -0,0 +1,74 @@
+"""
+Per-job scratch workspaces for the comparison pipeline.
+Every run renders, diffs and builds its Word documents in a folder of its own, under the system temp folder (or on
+tmpfs, /dev/shm, when asked) instead of next to the inputs and in the current folder, so concurrent runs, and mappings
+with the same file names, never touch each other's files. Finished outputs are moved into place atomically and the
+whole workspace is removed in one go when the run ends, whether it completed, failed or was cancelled.
+By default the rendered pages themselves go to the persistent render cache in the home folder (see pdf_render_cache);
+when the pipeline is given a scratch folder or tmpfs, it keeps them in the workspace too, see
+create_folders_screenshots_and_PDF_file.
+"""
+
+import os
+import errno
+import uuid
+import shutil
+import tempfile
+
+# Folder the workspaces are created in, the PDF_COMPARISON_SCRATCH environment variable overrides it
+SCRATCH_FOLDER = os.environ.get("PDF_COMPARISON_SCRATCH") or tempfile.gettempdir()
+
+# Memory-backed file system on Linux; its files take up RAM (or swap, when memory runs short) instead of disk space
+TMPFS_FOLDER = "/dev/shm"
+
+
+def scratch_root(tmpfs=False):
+    """Return the folder new workspaces go into; tmpfs falls back to SCRATCH_FOLDER where there is none."""
+    if tmpfs and os.path.isdir(TMPFS_FOLDER) and os.access(TMPFS_FOLDER, os.W_OK):
+        return TMPFS_FOLDER
+    return SCRATCH_FOLDER
+
+
+def publish_file(temp_path, final_path):
+    """Move a finished file into place atomically, readers see either the previous file or the complete new one."""
+    os.makedirs(os.path.dirname(os.path.abspath(final_path)), exist_ok=True)
+    try:
+        os.replace(temp_path, final_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # The workspace is on another file system (e.g. tmpfs), copy next to the destination first
+    staging_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        shutil.copyfile(temp_path, staging_path)
+        os.replace(staging_path, final_path)
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+    os.remove(temp_path)
+
+
+class JobWorkspace:
+    def __init__(self, scratch_folder=None, tmpfs=False):
+        parent = scratch_folder or scratch_root(tmpfs)
+        os.makedirs(parent, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix="pdf_comparison_job_", dir=parent)
+
+    def folder(self, *names):
+        """Return a folder inside the workspace, creating it when needed."""
+        path = os.path.join(self.path, *names)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def remove_folder(self, *names):
+        shutil.rmtree(os.path.join(self.path, *names), ignore_errors=True)
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,196 @@
+"""
+Page alignment for source and target PDFs whose page counts differ.
+Every page gets a compact fingerprint: a 64-bit difference hash (dHash) of a tiny grayscale render, plus the set
+of numbers on the page, which survive translation (figure numbers, part numbers, page references).
+The two fingerprint sequences are aligned with a banded Needleman-Wunsch alignment, so inserted or deleted pages
+come out unpaired instead of shifting every later pair. The band keeps the alignment fast on thousands of pages, and
+every row of the band is computed with NumPy array operations instead of cell by cell.
+"""
+
+import os
+import re
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+from file_identity import file_hash
+
+# Width in pixels of the tiny render used for the perceptual hash
+HASH_RENDER_WIDTH = 64
+
+# Score of leaving a page unpaired; matched pages score between -1 (nothing alike) and 1 (identical)
+GAP_PENALTY = -0.6
+
+# Extra room around the diagonal of the alignment, on top of the page count difference
+BAND_MARGIN = 32
+
+# Weight of the image hash against the numbers on the page
+HASH_WEIGHT = 0.7
+
+_fingerprint_cache = {}
+
+
+def page_fingerprint(page):
+    """Return (dhash_bits, numbers) for a fitz page: a (64,) bool array and a frozenset of the numbers in its text."""
+    scale = HASH_RENDER_WIDTH / max(page.rect.width, 1)
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", [pixmap.width, pixmap.height], pixmap.samples).resize((9, 8), Image.BILINEAR)
+    pixels = np.asarray(img, dtype=np.int16)
+    dhash_bits = (pixels[:, 1:] > pixels[:, :-1]).reshape(64)
+
+    numbers = frozenset(re.findall(r"\d+", page.get_text("text")))
+    return dhash_bits, numbers
+
+
+def pdf_fingerprints(pdf_path):
+    """Return the fingerprints of every page of a PDF, cached by the content hash of the file."""
+    key = file_hash(pdf_path)
+    if key not in _fingerprint_cache:
+        with fitz.open(pdf_path) as pdf_file:
+            fingerprints = [page_fingerprint(page) for page in pdf_file]
+        hashes = np.array([dhash_bits for dhash_bits, _ in fingerprints], dtype=bool).reshape(len(fingerprints), 64)
+        _fingerprint_cache[key] = (hashes, [numbers for _, numbers in fingerprints])
+    return _fingerprint_cache[key]
+
+
+def _number_matrix(source_numbers, target_numbers):
+    # Only numbers found in both documents can be shared by a page pair; the target pages get one boolean column
+    # per such number, every source page the list of its columns, so a row of intersections is one array sum
+    shared = sorted(frozenset().union(*source_numbers) & frozenset().union(*target_numbers))
+    column = {number: index for index, number in enumerate(shared)}
+    target_matrix = np.zeros((len(target_numbers), len(shared)), dtype=np.int32)
+    for j, numbers in enumerate(target_numbers):
+        target_matrix[j, [column[number] for number in numbers if number in column]] = 1
+    source_columns = [np.array([column[number] for number in numbers if number in column], dtype=np.intp) for numbers in source_numbers]
+    source_counts = np.array([len(numbers) for numbers in source_numbers])
+    target_counts = np.array([len(numbers) for numbers in target_numbers])
+    return target_matrix, source_columns, source_counts, target_counts
+
+
+def _row_similarity(source_hashes, target_hashes, numbers, i, first_j, last_j):
+    # Similarity in [0, 1] of source page i with target pages first_j..last_j-1
+    target_matrix, source_columns, source_counts, target_counts = numbers
+    hash_similarity = 1.0 - (target_hashes[first_j:last_j] != source_hashes[i]).sum(axis=1) / 64.0
+    shared = target_matrix[first_j:last_j][:, source_columns[i]].sum(axis=1)
+    union = source_counts[i] + target_counts[first_j:last_j] - shared
+    # Pages without any number on either side are compared by their image hash alone
+    number_similarity = shared / np.maximum(union, 1)
+    return np.where(union > 0, HASH_WEIGHT * hash_similarity + (1 - HASH_WEIGHT) * number_similarity, hash_similarity)
+
+
+def align_fingerprints(source_fingerprints, target_fingerprints, gap_penalty=GAP_PENALTY, band_margin=BAND_MARGIN):
+    """Align two fingerprint sequences and return a list of (source_index, target_index) pairs in page order.
+
+    One side of a pair is None for a page that only exists in the other document.
+    """
+    source_hashes, source_numbers = source_fingerprints
+    target_hashes, target_numbers = target_fingerprints
+    n, m = len(source_numbers), len(target_numbers)
+    if n == 0 or m == 0:
+        return [(i, None) for i in range(n)] + [(None, j) for j in range(m)]
+
+    band = abs(n - m) + band_margin
+    numbers = _number_matrix(source_numbers, target_numbers)
+
+    def band_bounds(i):
+        center = i * m // n
+        return max(0, center - band), min(m, center + band) + 1
+
+    # Score and traceback rows only cover the band, row i holds the columns lo..hi-1
+    # Traceback moves: 0 = pair, 1 = source page unpaired, 2 = target page unpaired
+    lo, hi = band_bounds(0)
+    previous = np.arange(lo, hi) * gap_penalty
+    bounds = [(lo, hi)]
+    moves = [np.full(hi - lo, 2, dtype=np.int8)]
+
+    # Every row is computed with array operations, the cells of a row are never visited one by one
+    for i in range(1, n + 1):
+        lo, hi = band_bounds(i)
+        previous_lo, previous_hi = bounds[-1]
+        columns = np.arange(lo, hi)
+        scores = np.full(hi - lo, -np.inf)
+        row_moves = np.ones(hi - lo, dtype=np.int8)
+
+        # Pair source page i - 1 with target page j - 1
+        paired = (columns > 0) & (columns - 1 >= previous_lo) & (columns - 1 < previous_hi)
+        if paired.any():
+            paired_columns = columns[paired]
+            similarity = _row_similarity(source_hashes, target_hashes, numbers, i - 1, paired_columns[0] - 1, paired_columns[-1])
+            scores[paired] = previous[paired_columns - 1 - previous_lo] + 2 * similarity - 1
+            row_moves[paired] = 0
+
+        # Leave source page i - 1 unpaired, only when strictly better than pairing it
+        unpaired = (columns >= previous_lo) & (columns < previous_hi)
+        gap_scores = np.full(hi - lo, -np.inf)
+        gap_scores[unpaired] = previous[columns[unpaired] - previous_lo] + gap_penalty
+        better = gap_scores > scores
+        scores[better] = gap_scores[better]
+        row_moves[better] = 1
+
+        # Leave target page j - 1 unpaired: scores[k] = max(scores[k], scores[k - 1] + gap_penalty) along the row,
+        # which is k * gap_penalty + the running maximum of scores[t] - t * gap_penalty
+        steps = np.arange(hi - lo) * gap_penalty
+        best = steps + np.maximum.accumulate(scores - steps)
+        left_scores = np.full(hi - lo, -np.inf)
+        left_scores[1:] = best[:-1] + gap_penalty
+        better = left_scores > scores
+        row_moves[better] = 2
+        previous = np.maximum(scores, left_scores)
+        bounds.append((lo, hi))
+        moves.append(row_moves)
+
+    # Trace back from the last page of both documents
+    alignment = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = moves[i][j - bounds[i][0]]
+        if move == 0:
+            i, j = i - 1, j - 1
+            alignment.append((i, j))
+        elif move == 1:
+            i -= 1
+            alignment.append((i, None))
+        else:
+            j -= 1
+            alignment.append((None, j))
+    alignment.reverse()
+    return alignment
+
+
+def align_pdf_pages(source_path, target_path):
+    """Align the pages of two PDFs, see align_fingerprints."""
+    return align_fingerprints(pdf_fingerprints(source_path), pdf_fingerprints(target_path))
+
+
+def aligned_image_pairs(alignment, source_image_paths, target_image_paths, source_page_sizes, target_page_sizes,
+                        output_folder):
+    """Turn an alignment into alternating-ready lists (source_image_paths, target_image_paths, page_sizes).
+
+    An unpaired page is matched with a blank page of the same size, written to output_folder.
+    """
+    paired_source_paths = []
+    paired_target_paths = []
+    page_sizes = []
+
+    for source_index, target_index in alignment:
+        if source_index is not None and target_index is not None:
+            paired_source_paths.append(source_image_paths[source_index])
+            paired_target_paths.append(target_image_paths[target_index])
+            page_sizes.append(target_page_sizes[target_index])
+        elif target_index is not None:
+            paired_source_paths.append(_blank_page(target_image_paths[target_index], output_folder, f"blank_page_{target_index + 1:03d}_source.png"))
+            paired_target_paths.append(target_image_paths[target_index])
+            page_sizes.append(target_page_sizes[target_index])
+        else:
+            paired_source_paths.append(source_image_paths[source_index])
+            paired_target_paths.append(_blank_page(source_image_paths[source_index], output_folder, f"blank_page_{source_index + 1:03d}_target.png"))
+            page_sizes.append(source_page_sizes[source_index])
+
+    return paired_source_paths, paired_target_paths, page_sizes
+
+
+def _blank_page(image_path, output_folder, file_name):
+    with Image.open(image_path) as img:
+        size = img.size
+    blank_path = os.path.join(output_folder, file_name)
+    Image.new("RGB", size, "white").save(blank_path, format="PNG")
+    return blank_path
@@ -0,0 +1,161 @@
+"""
+Composite page layouts for the comparison output.
+The alternating layout puts every source page and its target page on two output pages. A composite layout puts the
+pair on one output page instead: the two rendered pages are scaled to a common height and placed side by side, or
+scaled to a common width and stacked, with a thin separator between them. The output then has half the pages and
+pictures to write, and reviewers see both pages at once without flipping back and forth.
+Where a single image is needed (the Word documents and the streamed PDFs) the pages are joined as NumPy arrays
+(np.concatenate), only the scaling of pages with different sizes goes through Pillow. The native PDF writer places the
+two rendered images next to each other on one page instead (see create_composite_pdf), with the same geometry and
+without decoding any image. The size of a composite page in points follows from its pixels and the render zoom.
+"""
+
+import os
+import numpy as np
+from PIL import Image
+import fitz  # PyMuPDF
+from pdf_page_diff import pixmap_to_array
+from pdf_quality_profiles import image_extension, image_save_options
+
+# "alternating" writes source and target on separate pages, the others write one composite page per pair
+LAYOUTS = ("alternating", "side_by_side", "stacked")
+DEFAULT_LAYOUT = "alternating"
+
+# Width of the line between the source and the target page, in points
+SEPARATOR_POINTS = 6
+SEPARATOR_GRAY = 160
+
+
+def _channel_count(array):
+    return 1 if array.ndim == 2 else array.shape[2]
+
+
+def _channels(array, channels):
+    # Gray pages are only kept gray when both pages of the pair are gray
+    if array.ndim == 2:
+        array = array[:, :, np.newaxis]
+    if array.shape[2] == channels:
+        return array
+    if array.shape[2] == 1:
+        return np.repeat(array, channels, axis=2)
+    return array[:, :, :channels]
+
+
+def _scale(array, width, height):
+    if array.shape[1] == width and array.shape[0] == height:
+        return array
+    image = Image.fromarray(array[:, :, 0] if array.shape[2] == 1 else array)
+    scaled = np.asarray(image.resize((max(1, width), max(1, height)), Image.LANCZOS))
+    return scaled[:, :, np.newaxis] if scaled.ndim == 2 else scaled
+
+
+def composite_geometry(source_size, target_size, layout, separator=0):
+    """Return (composite_size, source_box, target_box) of two (width, height) pages joined in a composite layout.
+
+    side_by_side scales both pages to the taller height, stacked to the wider width; the boxes are (x0, y0, x1, y1).
+    """
+    (source_width, source_height), (target_width, target_height) = source_size, target_size
+    if layout == "side_by_side":
+        height = max(source_height, target_height)
+        source_width, target_width = source_width * height / source_height, target_width * height / target_height
+        return ((source_width + separator + target_width, height), (0, 0, source_width, height),
+                (source_width + separator, 0, source_width + separator + target_width, height))
+    if layout == "stacked":
+        width = max(source_width, target_width)
+        source_height, target_height = source_height * width / source_width, target_height * width / target_width
+        return ((width, source_height + separator + target_height), (0, 0, width, source_height),
+                (0, source_height + separator, width, source_height + separator + target_height))
+    raise ValueError(f"Unknown composite layout {layout!r}, expected side_by_side or stacked")
+
+
+def composite_page_array(source, target, layout, separator=0):
+    """Join a source and a target page array into one composite page array.
+
+    side_by_side scales both pages to the taller height and concatenates them left to right, stacked scales them to
+    the wider width and concatenates them top to bottom. A missing page (None) is left blank at the size of the other.
+    """
+    if source is None and target is None:
+        raise ValueError("A composite page needs at least one page.")
+    if source is None:
+        source = np.full_like(target, 255)
+    if target is None:
+        target = np.full_like(source, 255)
+    channels = 1 if _channel_count(source) == _channel_count(target) == 1 else 3
+    source, target = _channels(source, channels), _channels(target, channels)
+
+    _, source_box, target_box = composite_geometry((source.shape[1], source.shape[0]), (target.shape[1], target.shape[0]), layout, separator)
+    source = _scale(source, round(source_box[2] - source_box[0]), round(source_box[3] - source_box[1]))
+    target = _scale(target, round(target_box[2] - target_box[0]), round(target_box[3] - target_box[1]))
+    if layout == "side_by_side":
+        line = np.full((source.shape[0], separator, channels), SEPARATOR_GRAY, dtype=np.uint8)
+        return np.concatenate([source, line, target], axis=1)
+    line = np.full((separator, source.shape[1], channels), SEPARATOR_GRAY, dtype=np.uint8)
+    return np.concatenate([source, line, target], axis=0)
+
+
+def composite_page_size(array, zoom):
+    """Return the (width, height) in points of a composite page array rendered at the given zoom."""
+    return array.shape[1] / zoom, array.shape[0] / zoom
+
+
+def separator_pixels(zoom):
+    return max(1, round(SEPARATOR_POINTS * zoom))
+
+
+def _load_page_image(image_path):
+    with Image.open(image_path) as img:
+        return np.asarray(img if img.mode in ("L", "RGB") else img.convert("RGB"))
+
+
+def _array_pixmap(array):
+    colorspace = fitz.csGRAY if array.shape[2] == 1 else fitz.csRGB
+    return fitz.Pixmap(colorspace, array.shape[1], array.shape[0], np.ascontiguousarray(array).tobytes(), 0)
+
+
+def create_composite_pdf(source_image_paths, target_image_paths, pdf_file_path, layout, zoom):
+    """Write a comparison PDF with one page per pair of rendered page images, placed side by side or stacked.
+
+    The images are embedded as they are, on a page sized by composite_geometry, with a separator line between them.
+    """
+    doc = fitz.open()
+    for source_path, target_path in zip(source_image_paths, target_image_paths):
+        sizes = []
+        for path in (source_path, target_path):
+            # Only the image header is read
+            with Image.open(path) as img:
+                sizes.append((img.width / zoom, img.height / zoom))
+        (width, height), source_box, target_box = composite_geometry(sizes[0], sizes[1], layout, SEPARATOR_POINTS)
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(fitz.Rect(source_box), filename=source_path)
+        page.insert_image(fitz.Rect(target_box), filename=target_path)
+        line = (fitz.Rect(source_box[2], 0, target_box[0], height) if layout == "side_by_side"
+                else fitz.Rect(0, source_box[3], width, target_box[1]))
+        gray = SEPARATOR_GRAY / 255
+        page.draw_rect(line, color=None, fill=(gray, gray, gray))
+
+    doc.save(pdf_file_path, garbage=3, deflate=True)
+    doc.close()
+
+
+def composite_image_pairs(source_image_paths, target_image_paths, output_folder, layout, zoom, profile):
+    """Write one composite image per page pair to output_folder and return (image_paths, page_sizes).
+
+    The images are written in the encoding of the quality profile, the page sizes are in points. Used for the Word
+    documents, which need image files.
+    """
+    image_paths = []
+    page_sizes = []
+    for page_num, (source_path, target_path) in enumerate(zip(source_image_paths, target_image_paths)):
+        composite = composite_page_array(_load_page_image(source_path), _load_page_image(target_path), layout, separator_pixels(zoom))
+        image_path = os.path.join(output_folder, f"composite_page_{page_num + 1:03d}.{image_extension(profile)}")
+        Image.fromarray(composite[:, :, 0] if composite.shape[2] == 1 else composite).save(image_path, **image_save_options(profile))
+        image_paths.append(image_path)
+        page_sizes.append(composite_page_size(composite, zoom))
+    return image_paths, page_sizes
+
+
+def composite_pixmap(source, target, layout, zoom):
+    """Return the composite of two fitz Pixmaps (either may be None for a blank page) as a Pixmap, with its size in points."""
+    composite = composite_page_array(pixmap_to_array(source) if source is not None else None,
+                                     pixmap_to_array(target) if target is not None else None, layout, separator_pixels(zoom))
+    return _array_pixmap(composite), composite_page_size(composite, zoom)
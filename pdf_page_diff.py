@@ -0,0 +1,146 @@
+"""
+NumPy pixel diff between rendered source and target pages.
+Turns pixmap sample buffers (or rendered PNGs) into arrays and computes, per page pair, a changed-pixel mask,
+the bounding boxes of the changed regions and a change score (the fraction of changed pixels).
+Used by the comparison tools to drop identical page pairs and to highlight the changed regions on the target pages.
+"""
+
+import os
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+
+# A pixel counts as changed when any channel differs by more than this
+PIXEL_THRESHOLD = 32
+
+# Page pairs whose change score is at or below this are treated as identical
+MIN_CHANGE_SCORE = 0.0
+
+# Changed pixels are grouped into square blocks of this many pixels before building the bounding boxes
+BLOCK_SIZE = 16
+
+HIGHLIGHT_COLOR = (255, 0, 0)
+HIGHLIGHT_WIDTH = 4
+
+PageDiff = namedtuple("PageDiff", ["score", "mask", "boxes"])
+
+
+def pixmap_to_array(pixmap):
+    """Return the samples of a fitz Pixmap as a (height, width, channels) uint8 array, without copying."""
+    return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+
+
+def load_page_array(image_path):
+    """Return a rendered page image as an RGB (height, width, 3) uint8 array."""
+    with Image.open(image_path) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def _pad_to(array, height, width):
+    # Pages of different sizes are compared on a common canvas, padded with white
+    if array.shape[0] == height and array.shape[1] == width:
+        return array
+    padded = np.full((height, width, array.shape[2]), 255, dtype=np.uint8)
+    padded[:array.shape[0], :array.shape[1]] = array
+    return padded
+
+
+def diff_page_arrays(source, target, threshold=PIXEL_THRESHOLD, block_size=BLOCK_SIZE):
+    """Compare two page arrays and return a PageDiff(score, mask, boxes).
+
+    boxes are (x0, y0, x1, y1) pixel rectangles around the changed regions, in target page coordinates.
+    """
+    # A grayscale page is compared with a color page as if it were gray in every channel
+    if source.shape[2] == 1 and target.shape[2] > 1:
+        source = np.repeat(source, target.shape[2], axis=2)
+    elif target.shape[2] == 1 and source.shape[2] > 1:
+        target = np.repeat(target, source.shape[2], axis=2)
+    channels = min(source.shape[2], target.shape[2])
+    height = max(source.shape[0], target.shape[0])
+    width = max(source.shape[1], target.shape[1])
+    source = _pad_to(source[:, :, :channels], height, width)
+    target = _pad_to(target[:, :, :channels], height, width)
+
+    # int16 avoids the uint8 wrap-around on subtraction
+    difference = np.abs(source.astype(np.int16) - target.astype(np.int16)).max(axis=2)
+    mask = difference > threshold
+    score = float(mask.mean()) if mask.size else 0.0
+    return PageDiff(score, mask, changed_boxes(mask, block_size))
+
+
+def changed_boxes(mask, block_size=BLOCK_SIZE):
+    """Group the changed pixels of a mask into blocks and return the bounding box of each connected group."""
+    if not mask.any():
+        return []
+
+    # Reduce the mask to a grid of blocks, a block is changed when any of its pixels is
+    height, width = mask.shape
+    rows = -(-height // block_size)
+    cols = -(-width // block_size)
+    padded = np.zeros((rows * block_size, cols * block_size), dtype=bool)
+    padded[:height, :width] = mask
+    blocks = padded.reshape(rows, block_size, cols, block_size).any(axis=(1, 3))
+
+    # Flood fill the changed blocks (8-connected), the block grid is small enough for plain Python
+    labels = np.zeros(blocks.shape, dtype=np.int32)
+    boxes = []
+    for start_row, start_col in zip(*np.nonzero(blocks)):
+        if labels[start_row, start_col]:
+            continue
+        label = len(boxes) + 1
+        labels[start_row, start_col] = label
+        stack = [(start_row, start_col)]
+        min_row, min_col, max_row, max_col = start_row, start_col, start_row, start_col
+        while stack:
+            row, col = stack.pop()
+            min_row, max_row = min(min_row, row), max(max_row, row)
+            min_col, max_col = min(min_col, col), max(max_col, col)
+            for next_row in range(max(row - 1, 0), min(row + 2, rows)):
+                for next_col in range(max(col - 1, 0), min(col + 2, cols)):
+                    if blocks[next_row, next_col] and not labels[next_row, next_col]:
+                        labels[next_row, next_col] = label
+                        stack.append((next_row, next_col))
+        boxes.append((int(min_col * block_size), int(min_row * block_size),
+                      int(min((max_col + 1) * block_size, width)), int(min((max_row + 1) * block_size, height))))
+    return boxes
+
+
+def highlight_boxes(array, boxes, color=HIGHLIGHT_COLOR, line_width=HIGHLIGHT_WIDTH):
+    """Return a copy of a page array with a rectangle outline drawn around every box."""
+    highlighted = array.copy()
+    color = np.array(color, dtype=np.uint8)[:highlighted.shape[2]]
+    for x0, y0, x1, y1 in boxes:
+        highlighted[y0:y0 + line_width, x0:x1] = color
+        highlighted[max(y1 - line_width, y0):y1, x0:x1] = color
+        highlighted[y0:y1, x0:x0 + line_width] = color
+        highlighted[y0:y1, max(x1 - line_width, x0):x1] = color
+    return highlighted
+
+
+def filter_changed_pages(source_image_paths, target_image_paths, page_sizes, output_folder, prefix="target",
+                         threshold=PIXEL_THRESHOLD, min_score=MIN_CHANGE_SCORE):
+    """Diff every rendered page pair, drop the identical ones and highlight the changes on the others.
+
+    Returns (source_image_paths, target_image_paths, page_sizes, scores) for the changed pairs only.
+    The returned target paths are highlighted copies written to output_folder; the input PNGs are left untouched.
+    """
+    changed_source_paths = []
+    changed_target_paths = []
+    changed_page_sizes = []
+    scores = []
+
+    for page_num, (source_path, target_path, page_size) in enumerate(zip(source_image_paths, target_image_paths, page_sizes)):
+        target = load_page_array(target_path)
+        page_diff = diff_page_arrays(load_page_array(source_path), target, threshold)
+        if page_diff.score <= min_score:
+            continue
+
+        highlighted_path = os.path.join(output_folder, f"diff_page_{page_num + 1:03d}_{prefix}.png")
+        Image.fromarray(highlight_boxes(target, page_diff.boxes)).save(highlighted_path, format="PNG")
+
+        changed_source_paths.append(source_path)
+        changed_target_paths.append(highlighted_path)
+        changed_page_sizes.append(page_size)
+        scores.append(page_diff.score)
+
+    return changed_source_paths, changed_target_paths, changed_page_sizes, scores
@@ -0,0 +1,276 @@
+"""
+Shared PyMuPDF page renderer for the PDF comparison tools.
+Splits the pages of a document into contiguous page ranges and renders them on a process pool.
+Each worker process opens its own fitz document, so no PyMuPDF objects cross process boundaries.
+Results are always returned in page order, whatever order the workers finish in.
+The worker count can be set per call; a single worker renders serially in the calling process.
+With a RenderCache, pages already rendered in an earlier run are reused and only the missing ones are rendered.
+A QualityProfile (see pdf_quality_profiles) sets the DPI, colorspace and image encoding of the rendered pages.
+iter_rendered_pages streams the pages of very large documents one at a time instead, with bounded memory.
+"""
+
+import os
+import time
+import queue
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fitz  # PyMuPDF
+from PIL import Image
+from pdf_quality_profiles import profile_zoom, render_page_pixmap, pixmap_image, image_save_options, image_extension, cache_variant
+
+# Default number of render worker processes (None uses every available core)
+RENDER_WORKERS = None
+
+# Documents with fewer pages than this are rendered serially, pool start-up would cost more than it saves
+MIN_PAGES_FOR_POOL = 8
+
+# Each worker gets this many page ranges on average, so a slow range does not leave the other workers idle
+RANGES_PER_WORKER = 4
+
+# Pages rendered ahead of the consumer by iter_rendered_pages, this bounds the memory of the streaming pipeline
+STREAM_QUEUE_SIZE = 8
+
+_render_pool = None
+_render_pool_workers = None
+
+
+class JobCancelled(Exception):
+    """Raised between pages when a comparison job is cancelled."""
+
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled()
+
+
+def resolve_worker_count(workers=None):
+    """Return the number of render workers to use, never less than one."""
+    if workers is None:
+        workers = RENDER_WORKERS
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def split_page_ranges(page_count, workers):
+    """Split page_count pages into contiguous (first_page, last_page) ranges, last_page excluded."""
+    if page_count <= 0:
+        return []
+    range_count = min(page_count, workers * RANGES_PER_WORKER)
+    step, remainder = divmod(page_count, range_count)
+    page_ranges = []
+    first_page = 0
+    for index in range(range_count):
+        last_page = first_page + step + (1 if index < remainder else 0)
+        page_ranges.append((first_page, last_page))
+        first_page = last_page
+    return page_ranges
+
+
+def get_render_pool(workers):
+    """Return the shared render process pool, recreating it when the worker count changes."""
+    global _render_pool, _render_pool_workers
+    if _render_pool is None or _render_pool_workers != workers:
+        shutdown_render_pool()
+        _render_pool = ProcessPoolExecutor(max_workers=workers)
+        _render_pool_workers = workers
+    return _render_pool
+
+
+def shutdown_render_pool():
+    global _render_pool, _render_pool_workers
+    if _render_pool is not None:
+        _render_pool.shutdown()
+        _render_pool = None
+        _render_pool_workers = None
+
+atexit.register(shutdown_render_pool)
+
+
+def render_pages(pdf_path, page_numbers, output_folder, prefix, zoom, render_cache=None, file_hash=None,
+                 quality=None, page_done=None, cancel_event=None):
+    """Render the given pages of a PDF to image files.
+
+    Runs inside a worker process and returns one (page_num, image_path, timings) tuple per page, timings being
+    the seconds spent on {"render": ..., "encode": ...} for that page.
+    With a render cache the images are written into the cache instead of output_folder.
+    With a QualityProfile its DPI, colorspace and encoder replace zoom and the default PNG encoding.
+    When rendering in the calling process, page_done is called after every page and cancel_event is checked before it.
+    """
+    pdf_file = fitz.open(pdf_path)
+    mat = fitz.Matrix(zoom, zoom)
+    results = []
+    if quality is not None:
+        zoom = profile_zoom(quality)
+        save_options, extension, variant = image_save_options(quality), image_extension(quality), cache_variant(quality)
+    else:
+        save_options, extension, variant = {"format": "PNG"}, "png", ""
+
+    for page_num in page_numbers:
+        if cancel_event is not None and cancel_event.is_set():
+            pdf_file.close()
+            raise JobCancelled()
+        start_time = time.perf_counter()
+        page = pdf_file.load_page(page_num)
+
+        if quality is not None:
+            img = pixmap_image(render_page_pixmap(page, quality))
+        else:
+            image = page.get_pixmap(matrix=mat)
+            img = Image.frombytes("RGB", [image.width, image.height], image.samples)
+        rendered_time = time.perf_counter()
+        if render_cache is not None:
+            img_path = render_cache.store(img, file_hash, page_num, zoom, variant, extension, **save_options)
+        else:
+            img_path = f"{output_folder}/page_{page_num + 1:03d}_{prefix}.{extension}"
+            img.save(img_path, **save_options)
+
+        timings = {"render": rendered_time - start_time, "encode": time.perf_counter() - rendered_time}
+        results.append((page_num, img_path, timings))
+        if page_done is not None:
+            page_done(1)
+
+    pdf_file.close()
+    return results
+
+
+def _render_pages_task(task):
+    return render_pages(*task)
+
+
+def render_pdf_pages(pdf_path, output_folder, prefix, zoom=2, workers=None, render_cache=None, file_hash=None,
+                     progress=None, cancel_event=None, quality=None, report=None, page_numbers=None):
+    """Render every page of a PDF (or only page_numbers) to image files, in parallel when more than one worker is used.
+
+    Returns (page_sizes, image_paths), both in page order. Every page is rendered once, at one resolution;
+    the page sizes (in points) come from the page rectangles and are all a page layout needs.
+    With a render cache (and the file_hash of the PDF) only pages missing from the cache are rendered,
+    and the returned paths point into the cache.
+    progress(done, total) is called as pages finish; JobCancelled is raised once cancel_event is set.
+    quality is an optional QualityProfile, see render_pages.
+    With a RunReport, the render and encode time of every page and the render cache hits are recorded in it.
+    With page_numbers, the other pages are not rendered and their image paths are None; page_sizes has every page.
+    """
+    workers = resolve_worker_count(workers)
+    variant, extension = "", "png"
+    if quality is not None:
+        zoom = profile_zoom(quality)
+        variant, extension = cache_variant(quality), image_extension(quality)
+
+    # Page sizes come from the page rectangles, no rendering needed
+    with fitz.open(pdf_path) as pdf_file:
+        page_sizes = [(page.rect.width, page.rect.height) for page in pdf_file]
+    image_paths = [None] * len(page_sizes)
+    if page_numbers is None:
+        page_numbers = range(len(page_sizes))
+    page_count = len(page_numbers)
+
+    pending_pages = []
+    for page_num in page_numbers:
+        if render_cache is not None:
+            image_paths[page_num] = render_cache.get(file_hash, page_num, zoom, variant, extension)
+        if image_paths[page_num] is None:
+            pending_pages.append(page_num)
+
+    done_pages = [page_count - len(pending_pages)]
+
+    def page_done(count):
+        done_pages[0] += count
+        if progress is not None:
+            progress(done_pages[0], page_count)
+
+    page_done(0)
+    if workers == 1 or len(pending_pages) < MIN_PAGES_FOR_POOL:
+        results = render_pages(pdf_path, pending_pages, output_folder, prefix, zoom, render_cache, file_hash,
+                               quality, page_done, cancel_event)
+    else:
+        tasks = [(pdf_path, pending_pages[first:last], output_folder, prefix, zoom, render_cache, file_hash, quality)
+                 for first, last in split_page_ranges(len(pending_pages), workers)]
+        futures = {get_render_pool(workers).submit(_render_pages_task, task): len(task[1]) for task in tasks}
+        results = []
+        for future in as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                # Ranges that have not started yet are dropped, the running ones finish their pages
+                for pending_future in futures:
+                    pending_future.cancel()
+                raise JobCancelled()
+            results.extend(future.result())
+            page_done(futures[future])
+
+    for page_num, img_path, timings in sorted(results, key=lambda result: result[0]):
+        image_paths[page_num] = img_path
+        if report is not None:
+            report.add_page(pdf_path, page_num, timings)
+
+    if report is not None:
+        # Summed over the workers, so with a pool these exceed the wall-clock time
+        report.add_time("render", sum(timings["render"] for _, _, timings in results), len(results))
+        report.add_time("encode", sum(timings["encode"] for _, _, timings in results), len(results))
+        report.count("pages_rendered", len(results))
+        report.count("render_cache_hits", page_count - len(pending_pages))
+
+    if render_cache is not None and results:
+        render_cache.evict()
+
+    return page_sizes, image_paths
+
+
+def iter_rendered_pages(pdf_path, page_numbers=None, zoom=2, render_cache=None, file_hash=None, cancel_event=None,
+                        queue_size=STREAM_QUEUE_SIZE, quality=None):
+    """Yield (page_num, pixmap) for the given pages of a PDF (default: every page) one at a time, in the given order.
+
+    A background thread renders the pages into a bounded queue and stays at most queue_size pages ahead of the
+    consumer, so memory use does not grow with the page count. Pages found in the render cache are read from it,
+    new pages are not added to it. Closing the generator early stops the thread.
+    With a QualityProfile, pages are rendered at its DPI and colorspace.
+    """
+    variant, extension = "", "png"
+    if quality is not None:
+        zoom = profile_zoom(quality)
+        variant, extension = cache_variant(quality), image_extension(quality)
+    rendered_pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        # Wait for room in the queue, but give up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                rendered_pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def render():
+        try:
+            with fitz.open(pdf_path) as pdf_file:
+                mat = fitz.Matrix(zoom, zoom)
+                for page_num in range(pdf_file.page_count) if page_numbers is None else page_numbers:
+                    if stop.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                        break
+                    cached_path = render_cache.get(file_hash, page_num, zoom, variant, extension) if render_cache is not None else None
+                    if cached_path is not None:
+                        put((page_num, fitz.Pixmap(cached_path)))
+                    elif quality is not None:
+                        put((page_num, render_page_pixmap(pdf_file.load_page(page_num), quality)))
+                    else:
+                        put((page_num, pdf_file.load_page(page_num).get_pixmap(matrix=mat)))
+        except Exception as e:
+            put(e)
+        # End of the pages
+        put(None)
+
+    thread = threading.Thread(target=render, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = rendered_pages.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        check_cancelled(cancel_event)
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,95 @@
+"""
+Page selections for quick spot-check comparisons.
+A selection narrows the page pairs of a comparison before anything is rendered: explicit page ranges ("1-5,12,40-"),
+every Nth page, and/or a random sample of K pages drawn with a fixed seed, so a selection picks the same pages every
+time it is run. The parts combine: the ranges are applied first, then every Nth page, then the sample.
+Pages are numbered from 1 like in the target document; a page that only exists in the source (deleted from the
+target) is selected by its source page number. Only the pages whose text changed are picked by the text filter of
+the pipeline (see pdf_text_diff), which applies to the selected pages.
+The comparison output labels every page with its original page number, see label_comparison_pages of
+pdf_comparison_writer.
+"""
+
+import re
+import random
+from collections import namedtuple
+
+# ranges is a list of (first, last) page numbers, last is None for a range up to the end of the document
+PageSelection = namedtuple("PageSelection", ["ranges", "every", "sample", "seed"])
+
+# Seed of the random sample when none is given
+DEFAULT_SAMPLE_SEED = 0
+
+
+class PageSelectionError(ValueError):
+    """Raised for a page selection that cannot be understood."""
+
+
+def parse_page_ranges(text):
+    """Return the (first, last) page number ranges of a selection such as "1-5,12,40-"."""
+    ranges = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)(?:(-)(\d*))?", part)
+        if match is None:
+            raise PageSelectionError(f"Invalid page range {part!r}, expected e.g. 5, 1-10 or 40-")
+        first = int(match.group(1))
+        last = first if match.group(2) is None else int(match.group(3)) if match.group(3) else None
+        if first < 1 or (last is not None and last < first):
+            raise PageSelectionError(f"Invalid page range {part!r}, pages are numbered from 1")
+        ranges.append((first, last))
+    if not ranges:
+        raise PageSelectionError("The page selection is empty.")
+    return ranges
+
+
+def page_selection(pages=None, every=None, sample=None, seed=None):
+    """Return the PageSelection of the given options, or None when they select every page."""
+    if every is not None and every < 1:
+        raise PageSelectionError("Every Nth page needs N of at least 1.")
+    if sample is not None and sample < 1:
+        raise PageSelectionError("A random sample needs at least 1 page.")
+    if pages is None and every in (None, 1) and sample is None:
+        return None
+    return PageSelection(parse_page_ranges(pages) if pages is not None else None, every, sample,
+                         DEFAULT_SAMPLE_SEED if seed is None else seed)
+
+
+def pair_page_number(pair):
+    """Return the 1-based page number a (source_index, target_index) pair is selected by."""
+    source_index, target_index = pair
+    return (target_index if target_index is not None else source_index) + 1
+
+
+def select_pairs(alignment, selection):
+    """Return the (source_index, target_index) pairs of an alignment picked by a selection, in document order."""
+    pairs = list(alignment)
+    if selection is None:
+        return pairs
+    if selection.ranges is not None:
+        pairs = [pair for pair in pairs
+                 if any(first <= pair_page_number(pair) and (last is None or pair_page_number(pair) <= last) for first, last in selection.ranges)]
+    if selection.every is not None:
+        pairs = [pair for pair in pairs if (pair_page_number(pair) - 1) % selection.every == 0]
+    if selection.sample is not None and selection.sample < len(pairs):
+        sampled = set(random.Random(selection.seed).sample(range(len(pairs)), selection.sample))
+        pairs = [pair for pair_index, pair in enumerate(pairs) if pair_index in sampled]
+    return pairs
+
+
+def selection_settings(selection):
+    """Return a selection as a JSON-ready dictionary, for the job journal and the run summary."""
+    if selection is None:
+        return None
+    return {"ranges": [list(page_range) for page_range in selection.ranges] if selection.ranges is not None else None,
+            "every": selection.every, "sample": selection.sample, "seed": selection.seed if selection.sample is not None else None}
+
+
+def selection_from_settings(settings):
+    """Return the PageSelection of a dictionary made by selection_settings, or None."""
+    if settings is None:
+        return None
+    ranges = [tuple(page_range) for page_range in settings["ranges"]] if settings["ranges"] is not None else None
+    seed = settings["seed"] if settings["seed"] is not None else DEFAULT_SAMPLE_SEED
+    return PageSelection(ranges, settings["every"], settings["sample"], seed)
@@ -0,0 +1,94 @@
+"""
+Named resolution and encoding profiles for rendered PDF pages.
+A profile sets the render DPI, the colorspace (grayscale for pages without any color), the image encoder
+(fast-deflate PNG or JPEG at a given quality) and the JPEG chroma subsampling, so a job can trade fidelity for speed.
+draft is for a quick look, review matches the long-standing 144 DPI PNG output and print is for sign-off copies.
+screen matches the long-standing 72 DPI PNG output of the PDF to Word image converter. Only draft and print are lossy.
+"""
+
+import io
+from collections import namedtuple
+import numpy as np
+import fitz  # PyMuPDF
+from PIL import Image
+
+QualityProfile = namedtuple("QualityProfile", ["name", "dpi", "grayscale", "encoder", "jpeg_quality", "chroma_subsampling", "png_compress_level"])
+
+# grayscale is True, False or "auto" (only pages without any colored pixel are stored in grayscale)
+QUALITY_PROFILES = {
+    "draft": QualityProfile("draft", dpi=72, grayscale="auto", encoder="jpeg", jpeg_quality=70, chroma_subsampling="4:2:0", png_compress_level=1),
+    # PIL's default PNG compression level, like the converter always saved its pages
+    "screen": QualityProfile("screen", dpi=72, grayscale=False, encoder="png", jpeg_quality=None, chroma_subsampling=None, png_compress_level=6),
+    "review": QualityProfile("review", dpi=144, grayscale=False, encoder="png", jpeg_quality=None, chroma_subsampling=None, png_compress_level=1),
+    "print": QualityProfile("print", dpi=300, grayscale=False, encoder="jpeg", jpeg_quality=95, chroma_subsampling="4:4:4", png_compress_level=1),
+}
+
+DEFAULT_QUALITY_PROFILE = "review"
+
+
+def get_quality_profile(name=None):
+    """Return the QualityProfile with the given name, or the default profile for None."""
+    if isinstance(name, QualityProfile):
+        return name
+    try:
+        return QUALITY_PROFILES[name or DEFAULT_QUALITY_PROFILE]
+    except KeyError:
+        raise ValueError(f"Unknown quality profile {name!r}, expected one of: {', '.join(QUALITY_PROFILES)}")
+
+
+def profile_zoom(profile):
+    """Return the render zoom factor of a profile, PDF pages are laid out at 72 points per inch."""
+    return profile.dpi / 72
+
+
+def image_extension(profile):
+    return "jpg" if profile.encoder == "jpeg" else "png"
+
+
+def cache_variant(profile):
+    """Return the part of a render cache key that tells profiles with the same DPI apart."""
+    if profile.encoder == "jpeg":
+        return f"_{profile.grayscale}_jpeg{profile.jpeg_quality}_{profile.chroma_subsampling.replace(':', '')}".lower()
+    return f"_{profile.grayscale}_png".lower()
+
+
+def image_save_options(profile):
+    """Return the keyword arguments for PIL Image.save of a page image in this profile."""
+    if profile.encoder == "jpeg":
+        return {"format": "JPEG", "quality": profile.jpeg_quality, "subsampling": profile.chroma_subsampling}
+    return {"format": "PNG", "compress_level": profile.png_compress_level}
+
+
+def is_grayscale(pixmap):
+    """Return True when an RGB pixmap has no colored pixel, e.g. a page of black text."""
+    if pixmap.n < 3:
+        return True
+    samples = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(-1, pixmap.n)
+    return bool((samples[:, 0] == samples[:, 1]).all() and (samples[:, 1] == samples[:, 2]).all())
+
+
+def render_page_pixmap(page, profile):
+    """Render a fitz page at the DPI and colorspace of a profile."""
+    mat = fitz.Matrix(profile_zoom(profile), profile_zoom(profile))
+    pixmap = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY if profile.grayscale is True else fitz.csRGB)
+    if profile.grayscale == "auto" and is_grayscale(pixmap):
+        pixmap = fitz.Pixmap(fitz.csGRAY, pixmap)
+    return pixmap
+
+
+def pixmap_image(pixmap):
+    """Return a fitz Pixmap (gray or RGB, without alpha) as a PIL image."""
+    return Image.frombytes("L" if pixmap.n == 1 else "RGB", [pixmap.width, pixmap.height], pixmap.samples)
+
+
+def encode_pixmap(pixmap, profile):
+    """Return a pixmap ready for page.insert_image: JPEG bytes for JPEG profiles, otherwise the pixmap itself.
+
+    Pixmaps are stored with lossless deflate in the PDF, so PNG profiles need no encoding step at all.
+    """
+    if profile.encoder == "jpeg":
+        # PIL rather than Pixmap.tobytes, which cannot set the chroma subsampling
+        buffer = io.BytesIO()
+        pixmap_image(pixmap).save(buffer, **image_save_options(profile))
+        return buffer.getvalue()
+    return pixmap
@@ -0,0 +1,77 @@
+"""
+Reference-counted store of the rendered pages of one comparison run.
+Before the run, every source/target pair that may need screenshots retains its source and its target document.
+A document is rendered the first time a pair acquires it and every later pair gets the same page images, so a
+source mapped to ten targets, or used by several mappings, is rendered once per run. Pages asked for only in part
+(e.g. by the text filter) are rendered as they are first needed and never twice.
+While a document is retained its pages are pinned in the RenderCache, so eviction cannot remove them under a later
+pair; the last pair that releases the document unpins them and drops it from the store.
+"""
+
+from file_identity import file_hash
+from pdf_page_renderer import render_pdf_pages
+
+
+class RenderArtifactStore:
+    def __init__(self, render_cache, quality):
+        self.render_cache = render_cache
+        self.quality = quality
+        # file hash -> number of pairs that still need the document
+        self.references = {}
+        # file hash -> (page_sizes, image_paths), image_paths has None for pages not rendered yet
+        self.artifacts = {}
+
+    def retain(self, *pdf_paths):
+        for pdf_path in pdf_paths:
+            key = file_hash(pdf_path)
+            self.references[key] = self.references.get(key, 0) + 1
+
+    def release(self, *pdf_paths):
+        """Drop one reference to each document; the last one unpins and forgets its pages."""
+        for pdf_path in pdf_paths:
+            key = file_hash(pdf_path)
+            self.references[key] = self.references.get(key, 0) - 1
+            if self.references[key] <= 0:
+                del self.references[key]
+                self._forget(key)
+
+    def acquire(self, pdf_path, output_folder, prefix, page_numbers=None, workers=None, progress=None, cancel_event=None, report=None):
+        """Return (page_sizes, image_paths) of a document, rendering only pages no earlier pair of the run rendered.
+
+        With page_numbers only those pages are guaranteed to have an image path; the others may be None.
+        """
+        key = file_hash(pdf_path)
+        page_sizes, image_paths = self.artifacts.get(key, (None, None))
+        if image_paths is None:
+            missing = page_numbers
+        else:
+            missing = [page_num for page_num in (range(len(image_paths)) if page_numbers is None else page_numbers)
+                       if image_paths[page_num] is None]
+        if image_paths is None or missing:
+            page_sizes, rendered_paths = render_pdf_pages(pdf_path, output_folder, prefix, workers=workers, render_cache=self.render_cache,
+                                                          file_hash=key, progress=progress, cancel_event=cancel_event, quality=self.quality,
+                                                          report=report, page_numbers=missing)
+            new_paths = [path for path in rendered_paths if path is not None]
+            if image_paths is not None:
+                rendered_paths = [old_path if new_path is None else new_path for old_path, new_path in zip(image_paths, rendered_paths)]
+            image_paths = rendered_paths
+            self.artifacts[key] = (page_sizes, image_paths)
+            self.render_cache.pin(new_paths)
+        return page_sizes, image_paths
+
+    def _forget(self, key):
+        page_sizes, image_paths = self.artifacts.pop(key, (None, None))
+        if image_paths is not None:
+            self.render_cache.unpin([path for path in image_paths if path is not None])
+
+    def close(self):
+        """Unpin everything that is still retained, e.g. after a failed or cancelled run."""
+        for key in list(self.artifacts):
+            self._forget(key)
+        self.references.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
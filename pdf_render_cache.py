@@ -0,0 +1,118 @@
+"""
+Persistent, content-addressed cache for rendered PDF pages.
+Pages are stored as image files keyed by (file hash, page index, zoom, variant), so they survive across runs and
+mappings; the variant tells apart encodings of the same zoom, see pdf_quality_profiles.cache_variant.
+The cache has a byte budget; when it is exceeded the least recently used pages are evicted first.
+Writes go to a temporary file that is atomically moved into place, so concurrent readers never see a partial PNG.
+Pages read in the last few minutes are never evicted, so another process can keep using the paths it was given,
+and pages pinned by this process (see pdf_render_artifacts) are never evicted by it while they are pinned.
+"""
+
+import os
+import time
+import uuid
+
+# Default location and size budget of the render cache
+RENDER_CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".pdf_comparison_cache")
+RENDER_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Pages used more recently than this (in seconds) are kept even when the cache is over budget
+MIN_EVICTION_AGE = 10 * 60
+
+
+class RenderCache:
+    def __init__(self, cache_folder=RENDER_CACHE_FOLDER, max_bytes=RENDER_CACHE_MAX_BYTES, min_eviction_age=MIN_EVICTION_AGE):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.min_eviction_age = min_eviction_age
+        # path -> number of pins, pinned pages are still needed by the current run
+        self.pinned = {}
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    def page_path(self, file_hash, page_num, zoom, variant="", extension="png"):
+        """Return the cache path of a rendered page, whether or not it exists yet."""
+        # The first two characters of the hash shard the cache so no folder grows too large
+        shard_folder = os.path.join(self.cache_folder, file_hash[:2])
+        return os.path.join(shard_folder, f"{file_hash}_p{page_num + 1:05d}_z{zoom:g}{variant}.{extension}")
+
+    def get(self, file_hash, page_num, zoom, variant="", extension="png"):
+        """Return the path of a cached page and mark it as recently used, or None on a miss."""
+        path = self.page_path(file_hash, page_num, zoom, variant, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, img, file_hash, page_num, zoom, variant="", extension="png", **save_options):
+        """Save a PIL image into the cache and return its path. save_options go to img.save, the format defaults to PNG."""
+        path = self.page_path(file_hash, page_num, zoom, variant, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write under a unique temporary name, then move it into place in one step
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            save_options.setdefault("format", "PNG")
+            img.save(temp_path, **save_options)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return path
+
+    def pin(self, paths):
+        """Keep these pages out of evict() until they are unpinned as often as they were pinned."""
+        for path in paths:
+            self.pinned[path] = self.pinned.get(path, 0) + 1
+
+    def unpin(self, paths):
+        for path in paths:
+            count = self.pinned.get(path, 0) - 1
+            if count > 0:
+                self.pinned[path] = count
+            else:
+                self.pinned.pop(path, None)
+
+    def size(self):
+        """Return the total size of the cached pages in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove least recently used pages until the cache fits its byte budget. Returns the bytes freed."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        now = time.time()
+        freed = 0
+        for last_used, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            if now - last_used < self.min_eviction_age:
+                # Everything after this entry has been used even more recently
+                break
+            if path in self.pinned:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Already evicted by another process, or still open on Windows
+                continue
+            freed += size
+        return freed
+
+    def _entries(self):
+        entries = []
+        for shard in os.scandir(self.cache_folder):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                # Temporary files of writes that are still in progress are left alone
+                if entry.name.endswith((".png", ".jpg")):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
@@ -0,0 +1,135 @@
+"""
+Per-stage timing report for comparison runs.
+The pipeline times its stages (hashing, rendering, encoding, alignment, diffing, docx build, Word to PDF, PDF writing,
+cleanup) per mapping, and rendering and encoding also per page, and counts rendered pages and render cache hits.
+The report is written as JSON, with the totals per stage and the slowest pages first so pathological documents and
+regressions stand out. A stage hook (e.g. to mark stages in a sampling profiler) is called after every stage, and
+sampling_profiler starts pyinstrument for the whole run when it is installed.
+"""
+
+import os
+import json
+import time
+import uuid
+from contextlib import contextmanager
+
+# Default file name of the run report, written next to the comparison outputs
+REPORT_FILE_NAME = "comparison_report.json"
+
+# Number of slowest pages listed in the report summary
+SLOWEST_PAGES = 20
+
+
+class RunReport:
+    def __init__(self, stage_hook=None):
+        """stage_hook(stage, seconds, mapping) is called after every timed stage, if given."""
+        self.stage_hook = stage_hook
+        self.started = time.time()
+        self.mappings = []
+        self.current = None
+
+    def start_mapping(self, source_path, target_paths):
+        self.current = {
+            "source": source_path,
+            "targets": list(target_paths),
+            "stages": {},
+            "counters": {},
+            "pages": [],
+        }
+        self.mappings.append(self.current)
+
+    def add_time(self, stage, seconds, pages=0):
+        if self.current is None:
+            self.start_mapping(None, [])
+        entry = self.current["stages"].setdefault(stage, {"seconds": 0.0, "calls": 0, "pages": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+        entry["pages"] += pages
+        if self.stage_hook is not None:
+            self.stage_hook(stage, seconds, self.current)
+
+    def count(self, counter, amount=1):
+        if self.current is None:
+            self.start_mapping(None, [])
+        self.current["counters"][counter] = self.current["counters"].get(counter, 0) + amount
+
+    def add_page(self, document, page_num, timings):
+        """Record the per-page timings (a {stage: seconds} dict) of one page of a document."""
+        if self.current is None:
+            self.start_mapping(None, [])
+        self.current["pages"].append({"document": document, "page": page_num + 1, **{stage: round(seconds, 5) for stage, seconds in timings.items()}})
+
+    def flag_pages(self, flag, document, pages):
+        """Record pages of a document that need attention, e.g. the target pages with untranslated text."""
+        if self.current is None:
+            self.start_mapping(None, [])
+        if pages:
+            self.current.setdefault("flagged_pages", {}).setdefault(flag, []).append({"document": document, "pages": list(pages)})
+            self.count(f"{flag}_pages", len(pages))
+
+    def stage_totals(self):
+        """Return {stage: seconds} summed over all mappings, slowest stage first."""
+        totals = {}
+        for mapping in self.mappings:
+            for stage, entry in mapping["stages"].items():
+                totals[stage] = totals.get(stage, 0.0) + entry["seconds"]
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def to_dict(self):
+        pages = [page for mapping in self.mappings for page in mapping["pages"]]
+        counters = {}
+        for mapping in self.mappings:
+            for counter, amount in mapping["counters"].items():
+                counters[counter] = counters.get(counter, 0) + amount
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "stage_totals": {stage: round(seconds, 4) for stage, seconds in self.stage_totals().items()},
+            "counters": counters,
+            "slowest_pages": sorted(pages, key=lambda page: sum(value for key, value in page.items() if key not in ("document", "page")),
+                                    reverse=True)[:SLOWEST_PAGES],
+            "mappings": [{**mapping, "stages": {stage: {**entry, "seconds": round(entry["seconds"], 4)} for stage, entry in mapping["stages"].items()}}
+                         for mapping in self.mappings],
+        }
+
+    def save(self, report_path=REPORT_FILE_NAME):
+        # Write under a temporary name and move it into place
+        temp_path = f"{report_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(temp_path, report_path)
+
+
+@contextmanager
+def timed(report, stage, pages=0):
+    """Time a block as one call of a stage; does nothing without a report."""
+    if report is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.add_time(stage, time.perf_counter() - start_time, pages)
+
+
+def format_stage_totals(report, limit=5):
+    """Return the slowest stages of a report as 'stage mm:ss' lines, for the finished messages of the GUIs."""
+    lines = []
+    for stage, seconds in list(report.stage_totals().items())[:limit]:
+        lines.append(f"{stage}: {int(seconds // 60):02d}:{int(seconds % 60):02d}")
+    return "\n".join(lines)
+
+
+def sampling_profiler():
+    """Return a started pyinstrument Profiler, or None when pyinstrument is not installed.
+
+    Stop it with profiler.stop() and write it with profiler.output_html() or profiler.output_text().
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    profiler = Profiler()
+    profiler.start()
+    return profiler
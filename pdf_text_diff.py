@@ -0,0 +1,82 @@
+"""
+Text-layer comparison of source and target pages, without rendering anything.
+Extracts the text of every page with PyMuPDF, normalizes it (Unicode NFKC, case and whitespace folded) and hashes it,
+then gives every page pair a similarity ratio. Pairs with the same normalized text are flagged: in a localization
+check the target page is still untranslated, in an incremental release the page did not change.
+The pipeline uses pairs_to_render to rasterize only the page pairs below a similarity threshold.
+Pages without any text (scans, drawings) cannot be judged from their text and are always rendered.
+"""
+
+import re
+import hashlib
+import difflib
+import unicodedata
+from collections import namedtuple
+import fitz  # PyMuPDF
+from file_identity import file_hash
+
+# Page pairs whose text similarity is at or above this are not rendered; 1.0 only skips identical text
+TEXT_SIMILARITY_THRESHOLD = 1.0
+
+# similarity is None when neither page has any text, identical is True when the normalized texts are the same
+TextPageDiff = namedtuple("TextPageDiff", ["source_page", "target_page", "similarity", "identical"])
+
+_text_cache = {}
+
+
+def normalize_text(text):
+    """Return page text with Unicode compatibility forms, case and runs of whitespace folded."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def text_hash(normalized_text):
+    return hashlib.blake2b(normalized_text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def pdf_page_texts(pdf_path):
+    """Return [(text_hash, normalized_text)] for every page of a PDF, cached by the content hash of the file."""
+    key = file_hash(pdf_path)
+    if key not in _text_cache:
+        with fitz.open(pdf_path) as pdf_file:
+            texts = [normalize_text(page.get_text("text")) for page in pdf_file]
+        _text_cache[key] = [(text_hash(text), text) for text in texts]
+    return _text_cache[key]
+
+
+def text_similarity(source_text, target_text):
+    """Return the similarity ratio (0 to 1) of two normalized page texts."""
+    # Compared word by word, a character by character match of two translated pages takes up to a second per page
+    return difflib.SequenceMatcher(None, source_text.split(" "), target_text.split(" "), autojunk=False).ratio()
+
+
+def compare_page_texts(source_path, target_path, alignment):
+    """Return a TextPageDiff for every (source_index, target_index) pair of an alignment.
+
+    An unpaired page (None on one side) gets similarity 0.0, it always differs.
+    """
+    source_texts = pdf_page_texts(source_path)
+    target_texts = pdf_page_texts(target_path)
+    text_diffs = []
+    for source_index, target_index in alignment:
+        if source_index is None or target_index is None:
+            text_diffs.append(TextPageDiff(source_index, target_index, 0.0, False))
+            continue
+        (source_hash, source_text), (target_hash, target_text) = source_texts[source_index], target_texts[target_index]
+        if not source_text and not target_text:
+            text_diffs.append(TextPageDiff(source_index, target_index, None, False))
+        elif source_hash == target_hash:
+            text_diffs.append(TextPageDiff(source_index, target_index, 1.0, True))
+        else:
+            text_diffs.append(TextPageDiff(source_index, target_index, text_similarity(source_text, target_text), False))
+    return text_diffs
+
+
+def pairs_to_render(text_diffs, threshold=TEXT_SIMILARITY_THRESHOLD):
+    """Return the (source_index, target_index) pairs that still need screenshots: below threshold, or without text."""
+    return [(text_diff.source_page, text_diff.target_page) for text_diff in text_diffs
+            if text_diff.similarity is None or text_diff.similarity < threshold]
+
+
+def identical_text_pages(text_diffs):
+    """Return the 1-based target page numbers whose text is identical to their source page."""
+    return [text_diff.target_page + 1 for text_diff in text_diffs if text_diff.identical]
@@ -1,13 +1,11 @@
 """
-Rendering each PDF page as a PNG image.
+Rendering each PDF page as a PNG or JPEG image, at the resolution and encoding of the chosen quality profile.
 Embedding those images in a Word .docx file.
 Adjusting the page orientation (portrait/landscape) based on image dimensions.
 Offering a minimal GUI for folder input and execution via Tkinter.
 """
 import os
 import fitz  # PyMuPDF
-from PIL import Image
-import PIL
 from docx import Document
 from docx.enum.section import WD_ORIENT
 from docx.shared import Inches
@@ -15,21 +13,24 @@ from docx.shared import Pt
 from tkinter import *
 from tkinter import font
 from tkinter import messagebox
+from pdf_quality_profiles import QUALITY_PROFILES, get_quality_profile, render_page_pixmap, pixmap_image, image_save_options, image_extension
 
-def check_first_image_layout(images):
-    if images:
-        first_image = PIL.Image.open(images[0])
-        width, height = first_image.size
+# The screen profile renders 72 DPI PNG pages, the output this tool has always written; lossy profiles are opt-in
+CONVERTER_QUALITY_PROFILE = "screen"
+
+def check_first_image_layout(page_sizes):
+    if page_sizes:
+        width, height = page_sizes[0]
         return width > height  # True if landscape, False if portrait
     else:
-        return None  # Return None for an empty image list
+        return None  # Return None for an empty page list
 
 def create_word_document_first_portrait(images, page_sizes, first_page_landscape, pdf_name):
     doc = Document()
     sections = doc.sections
     landscape_page = first_page_landscape
-    first_image = PIL.Image.open(images[0])
-    first_image_width, first_image_height = first_image.size
+    # Page sizes come from the PDF, so the layout does not change with the render DPI
+    first_image_width, first_image_height = page_sizes[0]
 
     # Set margins to zero (remove margins)
     for section in sections:
@@ -39,8 +40,7 @@ def create_word_document_first_portrait(images, page_sizes, first_page_landscape
     section.page_height = Pt(first_image_height)
 
     for img_path, size in zip(images, page_sizes):
-        img = PIL.Image.open(img_path)
-        width, height = img.size
+        width, height = size
         
         if width > height:  # Check if width > height (indicating landscape layout)
             if landscape_page == False:
@@ -67,8 +67,7 @@ def create_word_document_first_landscape(images, page_sizes, first_page_landscap
     image_number = 1
     
     for img_path, size in zip(images, page_sizes):
-        img = PIL.Image.open(img_path)
-        width, height = img.size  
+        width, height = size  
 
         if image_number == 1:
             section.page_width = Pt(width)
@@ -98,7 +97,8 @@ def create_word_document_first_landscape(images, page_sizes, first_page_landscap
     doc.save(pdf_name + '.docx')
 
 def remove_png_files(current_script_path):
-    png_files = [file for file in os.listdir(current_script_path) if file.endswith(".png")]
+    # JPEG profiles write .jpg page images
+    png_files = [file for file in os.listdir(current_script_path) if file.endswith((".png", ".jpg"))]
 
     for png_file in png_files:
         file_path = os.path.join(current_script_path, png_file)
@@ -127,20 +127,20 @@ def Start():
                 pdf_document = fitz.open(pdf_path)
                 images = []
                 page_sizes = []
+                profile = get_quality_profile(quality_var.get())
                 
                 for page_num in range(pdf_document.page_count):
                     page = pdf_document.load_page(page_num)
-                    image = page.get_pixmap()
-                    img = PIL.Image.frombytes("RGB", [image.width, image.height], image.samples)
-                    image_path = f"page_{page_num + 1}.png"
-                    img.save(image_path, "PNG")
+                    img = pixmap_image(render_page_pixmap(page, profile))
+                    image_path = f"page_{page_num + 1}.{image_extension(profile)}"
+                    img.save(image_path, **image_save_options(profile))
                     images.append(image_path)
                     page_sizes.append((page.rect.width, page.rect.height))
                 
                 pdf_document.close()
                 
-                # Determine the layout for the first image in the images list
-                first_page_landscape = check_first_image_layout(images)
+                # Determine the layout of the first page, from its size in the PDF
+                first_page_landscape = check_first_image_layout(page_sizes)
                 
                 if first_page_landscape == False:
                     create_word_document_first_portrait(images, page_sizes, first_page_landscape, pdf_name)
@@ -154,7 +154,7 @@ def Start():
 
 window = Tk() # Add UI for this script
 width = 478
-height = 72
+height = 100
 screenwidth = window.winfo_screenwidth()
 screenheight = window.winfo_screenheight()
 window.title('PDF into Word screenshots')
@@ -169,5 +169,10 @@ entry_path = Entry(window, width = 50, font = font_normal)
 entry_path.place(x = 12, y = 35)
 button_start = Button(window, text = 'Start', width = 10, font = font_normal,command = Start)
 button_start.place(x = 378, y = 31)
+label_quality = Label(window, text = 'Quality', font = font_normal)
+label_quality.place(x = 10, y = 66)
+quality_var = StringVar(value = CONVERTER_QUALITY_PROFILE)
+option_quality = OptionMenu(window, quality_var, *QUALITY_PROFILES)
+option_quality.place(x = 70, y = 62)
 
 window.mainloop()
\ No newline at end of file
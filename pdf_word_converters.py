@@ -0,0 +1,289 @@
+"""
+Word to PDF converters for the Word output backend of the comparison tools.
+Every converter has convert(word_file_path, pdf_file_path) and convert_batch(jobs), jobs being a list of
+(word_file_path, pdf_file_path) pairs, so the pipeline can hand over all Word documents of a run at once.
+convert_batch converts every job it can and returns the (word_file_path, error) pairs of the jobs that failed, so one
+bad document does not fail the others; convert raises WordConversionError instead.
+docx2pdf drives Microsoft Word and needs Windows or macOS; it converts one document at a time.
+libreoffice keeps a small pool of headless LibreOffice workers, each with its own user profile, and converts the
+documents of a batch on all workers in parallel. When the Python UNO bindings can be imported, every worker is a
+persistent soffice process that stays up between documents and batches; without them each worker converts its share
+of a batch with a single soffice --convert-to call, so the start-up cost is paid once per batch instead of per file.
+The UNO bindings are an optional dependency: they ship with LibreOffice (on Linux often as a separate package such as
+python3-uno) and have to be importable by the Python running the tools; unoserver or any other package is not needed.
+"""
+
+import os
+import sys
+import time
+import uuid
+import shutil
+import atexit
+import tempfile
+import importlib.util
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of LibreOffice worker processes, each converts one document at a time
+LIBREOFFICE_WORKERS = 2
+
+# Seconds to wait for a persistent LibreOffice worker to accept connections
+LIBREOFFICE_START_TIMEOUT = 60
+
+# Seconds a --convert-to call may take per document before it is stopped
+LIBREOFFICE_TIMEOUT_PER_FILE = 120
+
+# docx2pdf only works where Microsoft Word is installed
+DEFAULT_WORD_CONVERTER = "docx2pdf" if sys.platform in ("win32", "darwin") else "libreoffice"
+
+_converters = {}
+_converters_lock = threading.Lock()
+
+
+class WordConversionError(Exception):
+    """Raised when a Word document could not be converted to PDF.
+
+    failures lists what failed, as (word_file_path, error) pairs from a converter or as (source_path, target_path,
+    error) triples from the pipeline; it is empty when the converter itself could not be used.
+    """
+
+    def __init__(self, message, failures=()):
+        super().__init__(message)
+        self.failures = list(failures)
+
+
+def check_conversions(failures):
+    """Raise WordConversionError when a convert_batch call returned failures."""
+    if failures:
+        raise WordConversionError("Could not convert " + "; ".join(f"{os.path.basename(path)}: {error}" for path, error in failures), failures)
+
+
+def find_soffice():
+    """Return the path of the LibreOffice soffice executable, or None when LibreOffice is not installed."""
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path is not None:
+            return path
+    for path in (r"C:\Program Files\LibreOffice\program\soffice.exe", "/Applications/LibreOffice.app/Contents/MacOS/soffice"):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class Docx2PdfConverter:
+    name = "docx2pdf"
+
+    def convert(self, word_file_path, pdf_file_path):
+        check_conversions(self.convert_batch([(word_file_path, pdf_file_path)]))
+
+    def convert_batch(self, jobs):
+        """Convert every (word_file_path, pdf_file_path) job one at a time and return the (word_file_path, error) pairs that failed."""
+        # docx2pdf drives Microsoft Word, only import it when this converter is actually used
+        import docx2pdf
+
+        failures = []
+        for word_file_path, pdf_file_path in jobs:
+            try:
+                docx2pdf.convert(word_file_path, pdf_file_path)
+            except Exception as e:
+                failures.append((word_file_path, f"{type(e).__name__}: {e}"))
+                continue
+            # docx2pdf reports some Word errors only on its output, not as an exception
+            if not os.path.isfile(pdf_file_path):
+                failures.append((word_file_path, "Word wrote no PDF"))
+        return failures
+
+    def close(self):
+        pass
+
+
+class LibreOfficeConverter:
+    name = "libreoffice"
+
+    def __init__(self, workers=None, soffice_path=None):
+        self.workers = max(1, workers or LIBREOFFICE_WORKERS)
+        self.soffice_path = soffice_path or find_soffice()
+        if self.soffice_path is None:
+            raise WordConversionError("LibreOffice is not installed, soffice was not found on the PATH.")
+        # Parallel LibreOffice processes need separate user profiles, they are kept warm for the life of the converter
+        self.profile_root = tempfile.mkdtemp(prefix="pdf_comparison_libreoffice_")
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.idle_workers = [LibreOfficeWorker(self.soffice_path, os.path.join(self.profile_root, f"worker_{index}"))
+                             for index in range(self.workers)]
+        self.lock = threading.Lock()
+
+    def convert(self, word_file_path, pdf_file_path):
+        check_conversions(self.convert_batch([(word_file_path, pdf_file_path)]))
+
+    def convert_batch(self, jobs):
+        """Convert every (word_file_path, pdf_file_path) job, spread over the workers, and return the (word_file_path, error) pairs that failed."""
+        # The workers report failures with absolute paths, they are mapped back to the paths of the jobs
+        original_paths = {os.path.abspath(word_file_path): word_file_path for word_file_path, _ in jobs}
+        jobs = [(os.path.abspath(word_file_path), os.path.abspath(pdf_file_path)) for word_file_path, pdf_file_path in jobs]
+        if not jobs:
+            return []
+        shares = [jobs[index::self.workers] for index in range(self.workers)]
+        futures = [self.pool.submit(self._convert_share, share) for share in shares if share]
+        return [(original_paths[path], error) for future in futures for path, error in future.result()]
+
+    def _convert_share(self, jobs):
+        with self.lock:
+            worker = self.idle_workers.pop()
+        try:
+            return worker.convert_batch(jobs)
+        finally:
+            with self.lock:
+                self.idle_workers.append(worker)
+
+    def close(self):
+        self.pool.shutdown()
+        for worker in self.idle_workers:
+            worker.close()
+        shutil.rmtree(self.profile_root, ignore_errors=True)
+
+
+class LibreOfficeWorker:
+    """One headless LibreOffice process with its own user profile, used by one thread at a time."""
+
+    def __init__(self, soffice_path, profile_folder):
+        self.soffice_path = soffice_path
+        self.profile_folder = profile_folder
+        self.pipe_name = f"pdf_comparison_{uuid.uuid4().hex}"
+        self.process = None
+        self.desktop = None
+
+    def convert_batch(self, jobs):
+        """Convert the jobs and return the (word_file_path, error) pairs that failed."""
+        if importlib.util.find_spec("uno") is None:
+            return self._convert_with_command(jobs)
+        return self._convert_with_uno(jobs)
+
+    def _convert_with_uno(self, jobs):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = PropertyValue()
+                prop.Name, prop.Value = name, value
+                result.append(prop)
+            return tuple(result)
+
+        failures = []
+        for word_file_path, pdf_file_path in jobs:
+            temp_path = f"{pdf_file_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                desktop = self._desktop()
+                document = desktop.loadComponentFromURL(uno.systemPathToFileUrl(word_file_path), "_blank", 0, properties(Hidden=True))
+                try:
+                    document.storeToURL(uno.systemPathToFileUrl(temp_path), properties(FilterName="writer_pdf_Export"))
+                finally:
+                    document.close(True)
+                os.replace(temp_path, pdf_file_path)
+            except Exception as e:
+                failures.append((word_file_path, f"{type(e).__name__}: {e}"))
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                # The worker may have crashed, it is restarted for the next document
+                self.close()
+        return failures
+
+    def _desktop(self):
+        """Return the UNO desktop of the worker, starting soffice when it is not running."""
+        if self.process is not None and self.process.poll() is None and self.desktop is not None:
+            return self.desktop
+        import uno
+
+        self.close()
+        self.process = subprocess.Popen(self._command(f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.monotonic() + LIBREOFFICE_START_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise WordConversionError("LibreOffice did not start.")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        return self.desktop
+
+    def _convert_with_command(self, jobs):
+        failures = []
+        remaining = list(jobs)
+        while remaining:
+            # soffice names its output after the input file, documents with the same name go into separate calls
+            batch, later, names = [], [], set()
+            for job in remaining:
+                name = os.path.splitext(os.path.basename(job[0]))[0].lower()
+                (later if name in names else batch).append(job)
+                names.add(name)
+            remaining = later
+
+            os.makedirs(self.profile_folder, exist_ok=True)
+            output_folder = tempfile.mkdtemp(prefix="output_", dir=self.profile_folder)
+            try:
+                subprocess.run(self._command("--convert-to", "pdf:writer_pdf_Export", "--outdir", output_folder,
+                                             *[word_file_path for word_file_path, _ in batch]),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=LIBREOFFICE_TIMEOUT_PER_FILE * len(batch))
+                for word_file_path, pdf_file_path in batch:
+                    converted_path = os.path.join(output_folder, os.path.splitext(os.path.basename(word_file_path))[0] + ".pdf")
+                    if os.path.isfile(converted_path):
+                        shutil.move(converted_path, pdf_file_path)
+                    else:
+                        failures.append((word_file_path, "LibreOffice wrote no PDF"))
+            except subprocess.TimeoutExpired:
+                failures.extend((word_file_path, "LibreOffice timed out") for word_file_path, _ in batch)
+            finally:
+                shutil.rmtree(output_folder, ignore_errors=True)
+        return failures
+
+    def _command(self, *arguments):
+        profile_url = "file:///" + os.path.abspath(self.profile_folder).replace("\\", "/").lstrip("/")
+        return [self.soffice_path, f"-env:UserInstallation={profile_url}", "--headless", "--invisible", "--nologo",
+                "--norestore", "--nodefault", "--nolockcheck", *arguments]
+
+    def close(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+
+WORD_CONVERTERS = {"docx2pdf": Docx2PdfConverter, "libreoffice": LibreOfficeConverter}
+
+
+def get_word_converter(name=None):
+    """Return the shared converter with the given name (default: DEFAULT_WORD_CONVERTER), starting it on first use."""
+    name = name or DEFAULT_WORD_CONVERTER
+    if name not in WORD_CONVERTERS:
+        raise ValueError(f"Unknown Word converter {name!r}, expected one of: {', '.join(WORD_CONVERTERS)}")
+    with _converters_lock:
+        if name not in _converters:
+            _converters[name] = WORD_CONVERTERS[name]()
+        return _converters[name]
+
+
+def close_word_converters():
+    """Stop the LibreOffice workers and every other running converter."""
+    with _converters_lock:
+        for converter in _converters.values():
+            converter.close()
+        _converters.clear()
+
+atexit.register(close_word_converters)
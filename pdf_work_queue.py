@@ -0,0 +1,354 @@
+"""
+SQLite work queue that splits a comparison batch over several worker processes or machines.
+A batch (the mappings of a manifest and the comparison settings) is enqueued as one job per source -> target pair
+into a SQLite file on a path every worker can reach. Workers claim jobs one at a time under a lease that a heartbeat
+thread keeps extending while the pair is compared; a job whose worker died is claimed again once its lease expires.
+Failed jobs are retried after a short delay until they have used up their attempts. The worker that sees the last
+job of a batch finish writes the batch report, a JSON summary of every pair, next to the comparison outputs.
+The queue uses SQLite's default rollback journal (no WAL, which needs shared memory and does not work on network
+shares) with short write transactions, so many workers can share it. Leases compare wall clock times, so machines
+sharing a queue need synchronized clocks. Paths in the queue must be valid on every worker.
+
+Enqueue with the command-line tool:   python pdf_comparison_cli.py manifest.csv --output-folder out --enqueue batch.sqlite
+Start workers on every machine:       python pdf_work_queue.py batch.sqlite --processes 4
+Show the state of the queue:          python pdf_work_queue.py batch.sqlite --status
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Seconds a claimed job stays reserved for its worker without a heartbeat
+LEASE_SECONDS = 120
+
+# Times a job is tried before it is reported as failed
+MAX_ATTEMPTS = 3
+
+# Seconds before a failed job is tried again, multiplied by the number of attempts so far
+RETRY_DELAY = 10
+
+# Seconds an idle worker waits before looking for jobs again
+POLL_INTERVAL = 2
+
+# Seconds a connection waits for another worker's write transaction
+BUSY_TIMEOUT = 30
+
+# File name of the batch report, written to the output folder of the batch
+BATCH_REPORT_FILE_NAME = "comparison_batch_{batch_id}.json"
+
+Job = namedtuple("Job", ["id", "batch_id", "source", "target", "attempts", "output_folder", "settings"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    manifest TEXT,
+    output_folder TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES batches(id),
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    started REAL,
+    finished REAL,
+    seconds REAL,
+    output TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs(status, not_before);
+CREATE INDEX IF NOT EXISTS jobs_by_batch ON jobs(batch_id, status);
+"""
+
+# Job statuses: pending and running are open, the others are final
+OPEN_STATUSES = ("pending", "running")
+
+
+def worker_name():
+    """Return a name for this worker process that is unique across the machines sharing a queue."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    def __init__(self, queue_path):
+        self.queue_path = os.path.abspath(queue_path)
+        # Transactions are opened explicitly, BEGIN IMMEDIATE takes the write lock up front so claims never race
+        self.connection = sqlite3.connect(self.queue_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def enqueue(self, mappings, settings, output_folder, manifest=None, max_attempts=MAX_ATTEMPTS):
+        """Add a batch of (source_path, [target_paths]) mappings, one job per pair, and return the batch id.
+
+        settings are the keyword arguments of run_manifest the workers compare the pairs with (see run_job).
+        """
+        batch_id = uuid.uuid4().hex[:12]
+        with self._transaction() as cursor:
+            cursor.execute("INSERT INTO batches (id, manifest, output_folder, settings, created) VALUES (?, ?, ?, ?, ?)",
+                           (batch_id, manifest, os.path.abspath(output_folder), json.dumps(settings), time.time()))
+            cursor.executemany("INSERT INTO jobs (batch_id, source, target, max_attempts) VALUES (?, ?, ?, ?)",
+                               [(batch_id, os.path.abspath(source_path), os.path.abspath(target_path), max_attempts)
+                                for source_path, target_paths in mappings for target_path in target_paths])
+        return batch_id
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        """Reserve the next job that is due for worker and return it, or None when no job is due."""
+        now = time.time()
+        with self._transaction() as cursor:
+            # Jobs whose worker stopped sending heartbeats are free again, unless they have no attempts left
+            cursor.execute("UPDATE jobs SET status = 'failed', finished = ?, error = 'The worker stopped responding (lease expired).' "
+                           "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts", (now, now))
+            row = cursor.execute("SELECT jobs.*, batches.output_folder, batches.settings FROM jobs JOIN batches ON batches.id = jobs.batch_id "
+                                 "WHERE (jobs.status = 'pending' AND jobs.not_before <= ?) OR (jobs.status = 'running' AND jobs.lease_expires < ?) "
+                                 "ORDER BY jobs.id LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            cursor.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_expires = ?, started = ? WHERE id = ?",
+                           (worker, now + lease_seconds, now, row["id"]))
+        return Job(row["id"], row["batch_id"], row["source"], row["target"], row["attempts"] + 1, row["output_folder"], json.loads(row["settings"]))
+
+    def heartbeat(self, job_id, worker, lease_seconds=LEASE_SECONDS):
+        """Extend the lease of a running job; returns False when the worker no longer holds it."""
+        with self._transaction() as cursor:
+            cursor.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                           (time.time() + lease_seconds, job_id, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, status, output=None, seconds=None):
+        """Record the result (ok or skipped) of a job the worker still holds."""
+        with self._transaction() as cursor:
+            cursor.execute("UPDATE jobs SET status = ?, finished = ?, seconds = ?, output = ?, error = NULL "
+                           "WHERE id = ? AND worker = ? AND status = 'running'", (status, time.time(), seconds, output, job_id, worker))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error, seconds=None):
+        """Record a failed attempt; the job is tried again later unless it has used up its attempts."""
+        now = time.time()
+        with self._transaction() as cursor:
+            cursor.execute("UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+                           "not_before = ? + ? * attempts, finished = ?, seconds = ?, error = ? "
+                           "WHERE id = ? AND worker = ? AND status = 'running'", (now, RETRY_DELAY, now, seconds, error, job_id, worker))
+            return cursor.rowcount == 1
+
+    def finish_batches(self):
+        """Mark every batch whose last job has finished as finished and return their ids, each id is returned only once."""
+        with self._transaction() as cursor:
+            rows = cursor.execute("SELECT id FROM batches WHERE finished IS NULL AND NOT EXISTS "
+                                  "(SELECT 1 FROM jobs WHERE jobs.batch_id = batches.id AND jobs.status IN (?, ?))", OPEN_STATUSES).fetchall()
+            batch_ids = [row["id"] for row in rows]
+            cursor.executemany("UPDATE batches SET finished = ? WHERE id = ?", [(time.time(), batch_id) for batch_id in batch_ids])
+        return batch_ids
+
+    def batch_report(self, batch_id):
+        """Return the summary of a batch as a JSON-ready dictionary, like the summary of pdf_comparison_cli."""
+        batch = self.connection.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        jobs = self.connection.execute("SELECT * FROM jobs WHERE batch_id = ? ORDER BY id", (batch_id,)).fetchall()
+        counts = {}
+        for job in jobs:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "batch": batch_id,
+            "manifest": batch["manifest"],
+            "output_folder": batch["output_folder"],
+            "settings": json.loads(batch["settings"]),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(batch["created"])),
+            "elapsed_seconds": round((batch["finished"] or time.time()) - batch["created"], 3),
+            "finished": batch["finished"] is not None,
+            "succeeded": counts.get("ok", 0),
+            "skipped": counts.get("skipped", 0),
+            "failed": counts.get("failed", 0),
+            "open": sum(counts.get(status, 0) for status in OPEN_STATUSES),
+            "retries": sum(max(0, job["attempts"] - 1) for job in jobs),
+            "workers": sorted({job["worker"] for job in jobs if job["worker"]}),
+            "results": [{"source": job["source"], "target": job["target"], "output": job["output"], "status": job["status"],
+                         "attempts": job["attempts"], "worker": job["worker"], "seconds": job["seconds"], "error": job["error"]}
+                        for job in jobs],
+        }
+
+    def batch_ids(self):
+        return [row["id"] for row in self.connection.execute("SELECT id FROM batches ORDER BY created")]
+
+    def close(self):
+        self.connection.close()
+
+
+def write_batch_report(work_queue, batch_id):
+    """Write the report of a batch to its output folder and return the path of the report."""
+    report = work_queue.batch_report(batch_id)
+    report_path = os.path.join(report["output_folder"], BATCH_REPORT_FILE_NAME.format(batch_id=batch_id))
+    os.makedirs(report["output_folder"], exist_ok=True)
+    # Write under a temporary name and move it into place, readers never see half a report
+    temp_path = f"{report_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(temp_path, report_path)
+    return report_path
+
+
+class Heartbeat(threading.Thread):
+    """Keeps extending the lease of a job while it runs; sets cancel_event when the lease was lost to another worker."""
+
+    def __init__(self, queue_path, job_id, worker, cancel_event, lease_seconds=LEASE_SECONDS):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.job_id = job_id
+        self.worker = worker
+        self.cancel_event = cancel_event
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        # SQLite connections belong to the thread that opened them
+        work_queue = WorkQueue(self.queue_path)
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                try:
+                    if not work_queue.heartbeat(self.job_id, self.worker, self.lease_seconds):
+                        # Another worker took over the job, stop comparing it
+                        self.cancel_event.set()
+                        return
+                except sqlite3.Error:
+                    # The queue is busy or unreachable for a moment, the lease covers a few missed heartbeats
+                    pass
+        finally:
+            work_queue.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job, cancel_event=None):
+    """Compare the pair of a job in the output folder of its batch and return the result dictionary of run_manifest."""
+    # Imported here, so --status and enqueueing do not load the rendering stack
+    from pdf_comparison_cli import run_manifest
+    from pdf_job_journal import JobJournal
+    from pdf_page_selection import selection_from_settings
+
+    settings = job.settings
+    os.makedirs(job.output_folder, exist_ok=True)
+    # Comparison outputs are written relative to the current folder, like with the command-line tool
+    os.chdir(job.output_folder)
+    # The workers of a batch share its journal, it merges their records when saving
+    journal = JobJournal(settings["journal"]) if settings.get("journal") else None
+    results = run_manifest([(job.source, [job.target])], settings.get("output_backend", "pdf"), settings.get("workers"), settings.get("diff_pages", False),
+                           journal, settings.get("quality"), None, settings.get("word_converter"), settings.get("scratch_folder"),
+                           settings.get("tmpfs", False), settings.get("text_filter"), selection_from_settings(settings.get("page_selection")),
+                           settings.get("layout", "alternating"), cancel_event=cancel_event)
+    return results[0]
+
+
+def run_worker(queue_path, worker=None, lease_seconds=LEASE_SECONDS, poll_interval=POLL_INTERVAL, stop_when_empty=True, render_workers=None):
+    """Claim and compare jobs until the queue has none left (or forever without stop_when_empty); returns the number of jobs run.
+
+    render_workers overrides the number of render processes the batch was enqueued with, e.g. when several workers share a machine.
+    """
+    worker = worker or worker_name()
+    work_queue = WorkQueue(queue_path)
+    jobs_run = 0
+    try:
+        while True:
+            job = work_queue.claim(worker, lease_seconds)
+            if job is None:
+                for batch_id in work_queue.finish_batches():
+                    print(f"[batch finished] {batch_id}: {write_batch_report(work_queue, batch_id)}", file=sys.stderr)
+                # Jobs waiting for a retry or held by other workers may still come back
+                open_jobs = work_queue.connection.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", OPEN_STATUSES).fetchone()[0]
+                if stop_when_empty and not open_jobs:
+                    return jobs_run
+                time.sleep(poll_interval)
+                continue
+
+            if render_workers is not None:
+                job = job._replace(settings={**job.settings, "workers": render_workers})
+            cancel_event = threading.Event()
+            heartbeat = Heartbeat(work_queue.queue_path, job.id, worker, cancel_event, lease_seconds)
+            heartbeat.start()
+            start_time = time.time()
+            try:
+                result = run_job(job, cancel_event)
+            except Exception as e:
+                result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                heartbeat.stop()
+            seconds = round(time.time() - start_time, 3)
+            jobs_run += 1
+
+            if result["status"] == "failed":
+                work_queue.fail(job.id, worker, result.get("error"), seconds)
+            else:
+                work_queue.complete(job.id, worker, result["status"], result.get("output"), seconds)
+            for batch_id in work_queue.finish_batches():
+                print(f"[batch finished] {batch_id}: {write_batch_report(work_queue, batch_id)}", file=sys.stderr)
+    finally:
+        work_queue.close()
+
+
+def _worker_process(queue_path, lease_seconds, stop_when_empty, render_workers):
+    run_worker(queue_path, lease_seconds=lease_seconds, stop_when_empty=stop_when_empty, render_workers=render_workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run comparison jobs from a SQLite work queue shared by several workers.")
+    parser.add_argument("queue", help="path of the SQLite queue file, batches are added with pdf_comparison_cli.py --enqueue")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes started on this machine (default: 1)")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="render processes per worker (default: what the batch was enqueued with, else all cores)")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help=f"seconds a job stays reserved without a heartbeat before another worker takes it over (default: {LEASE_SECONDS})")
+    parser.add_argument("--wait", action="store_true", help="keep waiting for new batches instead of stopping when the queue is empty")
+    parser.add_argument("--status", action="store_true", help="only print the state of every batch in the queue as JSON")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        work_queue = WorkQueue(args.queue)
+        status = [{key: value for key, value in work_queue.batch_report(batch_id).items() if key != "results"} for batch_id in work_queue.batch_ids()]
+        work_queue.close()
+        json.dump(status, sys.stdout, indent=2)
+        print()
+        return 0
+
+    if args.processes <= 1:
+        run_worker(args.queue, lease_seconds=args.lease, stop_when_empty=not args.wait, render_workers=args.render_workers)
+        return 0
+    # Every worker process claims its own jobs; without a setting, the cores are split between them
+    render_workers = args.render_workers or max(1, (os.cpu_count() or 1) // args.processes)
+    processes = [multiprocessing.Process(target=_worker_process, args=(args.queue, args.lease, not args.wait, render_workers))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return 0 if all(process.exitcode == 0 for process in processes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())